@@ -0,0 +1,127 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from handball.court import HandballCourtEngine
+from handball.density import ShotDensity
+from handball.events import EventLog
+from handball.export import iter_csv
+from handball.history import HistoryStore
+from handball.render import heatmap_png, heatmap_cache
+from handball.sheet_sync import SHEET_COLUMNS, sheet_frame
+from handball.stats import StatsStore, get_stats_logic
+from handball.synthetic import iter_logs
+from handball.timeline import Timeline
+
+# ================================
+# 分析処理のベンチマーク
+# ================================
+# 使い方（リポジトリ直下で）:
+#   python -m benchmarks.run                       # 100 / 1万 / 100万件で計測し baseline.json と比較
+#   python -m benchmarks.run --sizes 100 10000     # 件数を指定
+#   python -m benchmarks.run --save                # 計測結果を baseline.json に保存
+# baseline より tolerance 倍以上遅い項目は REGRESSION として表示し、終了コード 1 を返す。
+BASELINE = Path(__file__).with_name("baseline.json")
+SIZES = (100, 10_000, 1_000_000)
+TOLERANCE = 1.5
+MIN_DELTA_SEC = 1e-5  # これより小さい差は計測誤差として扱う
+SMALL_OP_SEC = 0.2  # 短い処理はこの時間まで繰り返して 1 回あたりの最小値をとる
+
+
+def timeit(fn, budget=SMALL_OP_SEC):
+    best = float("inf"); spent = 0.0; runs = 0
+    while runs < 3 or (spent < budget and runs < 10_000):
+        t0 = time.perf_counter(); fn(); dt = time.perf_counter() - t0
+        best = min(best, dt); spent += dt; runs += 1
+        if dt > budget: break
+    return best
+
+
+def bench_size(n, seed):
+    res = {}
+    t0 = time.perf_counter(); logs = EventLog.from_records(list(iter_logs(n, seed))); res["events.build"] = time.perf_counter() - t0
+    dicts = logs[:]  # 従来の list of dict
+    engine = HandballCourtEngine()
+
+    # 集計: 従来 API（全件から作り直し）/ 1 件追加 / 集計済みからの読み出し
+    res["stats.get_stats_logic"] = timeit(lambda: get_stats_logic(dicts, "味方", dicts))
+    store = StatsStore(dicts); inc = StatsStore()
+    res["stats.add_one"] = timeit(lambda: inc.add(dicts[-1]))
+    res["stats.query_team"] = timeit(lambda: store.stats("味方"))
+    res["stats.query_gk"] = timeit(lambda: store.stats("味方", target_no=dicts[0]["vs_gk"], is_gk_target=True))
+
+    # 時間の索引: ログ全体からの作成 / 時間帯（5 分）の STAT_ITEMS
+    res["timeline.build"] = timeit(lambda: Timeline().sync(logs))
+    tl = Timeline().sync(logs)
+    res["timeline.window"] = timeit(lambda: tl.stats("味方", 600.0, 900.0))
+
+    # シュート位置のマス目: ログ全体からの作成 / 絞り込み 1 つ分のグリッド（キャッシュなし）
+    res["density.build"] = timeit(lambda: ShotDensity().sync(logs))
+    dens = ShotDensity().sync(logs)
+    def density_grid():
+        dens._grids.clear(); dens.grid("味方")
+    res["density.grid"] = timeit(density_grid)
+
+    # コート: 1 点ずつの判定と、n 点まとめての判定
+    rng = np.random.default_rng(seed)
+    xs = rng.uniform(-10.5, 10.5, n); ys = rng.uniform(7.5, 20.5, n)
+    res["court.get_poly"] = timeit(lambda: engine.get_poly("3"))
+    res["court.find_zone_at"] = timeit(lambda: engine.find_zone_at(float(xs[0]), float(ys[0])))
+    res["court.zone_codes_at"] = timeit(lambda: engine.zone_codes_at(xs, ys))
+
+    # ヒートマップ: キャッシュなし / キャッシュあり
+    def heat_cold():
+        heatmap_cache.clear(); heatmap_png("味方", store)
+    res["render.heatmap_cold"] = timeit(heat_cold, budget=1.0)
+    res["render.heatmap_warm"] = timeit(lambda: heatmap_png("味方", store))
+
+    # CSV 書き出し（チャンクごとに捨てて、ファイル全体はメモリに載せない）
+    res["export.csv"] = timeit(lambda: sum(len(c) for c in iter_csv(logs)), budget=1.0)
+
+    # 過去試合: 取り込みと試合の選択
+    with tempfile.TemporaryDirectory() as d:
+        hist = HistoryStore(Path(d) / "history.sqlite3")
+        t0 = time.perf_counter()
+        for a in range(0, n, 50_000):
+            df = sheet_frame(logs, a, min(a + 50_000, n)).reindex(columns=list(SHEET_COLUMNS))
+            hist.import_rows(list(SHEET_COLUMNS), df.values.tolist())
+        res["history.import"] = time.perf_counter() - t0
+        labels = hist.matches(); target = labels[len(labels) // 2]
+        res["history.list_matches"] = timeit(lambda: hist.matches(opponent=dicts[0]["相手校"]))
+        res["history.select_match"] = timeit(lambda: StatsStore(hist.match_logs(target)).stats("味方"))
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Handball analyst の分析処理ベンチマーク")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--save", action="store_true", help="結果を baseline.json に保存する")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--json", type=Path, help="結果を JSON で書き出す")
+    args = ap.parse_args(argv)
+
+    base = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results = {}; regressions = []
+    for n in args.sizes:
+        res = results[str(n)] = bench_size(n, args.seed)
+        print(f"--- {n:,} events")
+        for name, sec in res.items():
+            ref = base.get(str(n), {}).get(name)
+            flag = ""
+            if ref and sec > ref * args.tolerance and sec - ref > MIN_DELTA_SEC:
+                flag = f"  REGRESSION (baseline {ref*1e3:.3f} ms)"; regressions.append((n, name))
+            print(f"{name:26s} {sec*1e3:12.3f} ms{flag}")
+    if args.json: args.json.write_text(json.dumps(results, indent=2))
+    if args.save:
+        base.update(results); args.baseline.write_text(json.dumps(base, indent=2, sort_keys=True) + "\n")
+        print(f"saved {args.baseline}")
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# リポジトリ直下を import パスに入れる（pytest をどこから実行しても handball を読み込めるように）
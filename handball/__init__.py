@@ -0,0 +1,28 @@
+# Handball analyst の分析ロジック（Streamlit に依存しない部分）
+#
+# パッケージの import は軽く保つ（サブモジュールは名前を最初に参照したときに読み込む）。
+#   schema / stats : 標準ライブラリのみ
+#   court / events / density : NumPy
+#   render         : matplotlib・PIL（描画するときに読み込む）
+import importlib
+
+_EXPORTS = {
+    "LOG_COLUMNS": "schema", "EXPORT_COLUMNS": "schema", "MATCH_KEYS": "schema", "match_label": "schema",
+    "STAT_ITEMS": "stats", "StatsStore": "stats", "get_stats_logic": "stats", "format_stat": "stats",
+    "HandballCourtEngine": "court", "ZONE_IDS": "court",
+    "EventLog": "events", "ShotDensity": "density",
+    "heatmap_png": "render", "density_png": "render", "court_preview_image": "render",
+}
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    mod = _EXPORTS.get(name)
+    if mod is None: raise AttributeError(f"module 'handball' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"handball.{mod}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,4 @@
+import sys
+from handball.cli import main
+
+sys.exit(main())
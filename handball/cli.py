@@ -0,0 +1,116 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from handball.schema import EXPORT_COLUMNS, TEAMS, clean_cell, record_label
+from handball.stats import STAT_ITEMS, format_stat, match_summary
+
+# ================================
+# コマンドライン（python -m handball）
+# ================================
+# 書き出した CSV（またはシートのスナップショット）を読み、試合ごとに集計する。Streamlit・matplotlib は読み込まない。
+#   python -m handball stats 記録.csv                   # 全試合のスコアと STAT_ITEMS
+#   python -m handball stats 記録.csv --players          # 選手ごとの行も出す
+#   python -m handball stats 記録.csv --format csv > 集計.csv
+#   python -m handball matches 記録.csv                 # 試合ラベルの一覧
+#   python -m handball report 記録.csv -o reports --format pdf --jobs 4   # 試合ごとのレポート（handball/report.py）
+
+
+def read_records(path):
+    # "-" なら標準入力。列の値は clean_cell で文字列か None にそろえる
+    fp = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig") if path == "-" else open(path, encoding="utf-8-sig", newline="")
+    with fp:
+        for r in csv.DictReader(fp):
+            rec = {k: clean_cell(v) for k, v in r.items() if k is not None}
+            if any(v is not None for v in rec.values()): yield rec
+
+
+def group_matches(records):
+    # 試合ラベル -> 記録のリスト（ファイルに最初に現れた順）
+    out = {}
+    for r in records: out.setdefault(record_label(r), []).append(r)
+    return out
+
+
+def _print_text(summaries, out):
+    for label, s in summaries.items():
+        a, o = s["teams"]["味方"], s["teams"]["相手"]
+        out.write(f"=== {label}  ({s['events']} 件)\n")
+        out.write(f"{a['name']} {a['goals']} - {o['goals']} {o['name']}  (前半 {a['goals_by_period']['前半']}-{o['goals_by_period']['前半']} / 後半 {a['goals_by_period']['後半']}-{o['goals_by_period']['後半']})\n")
+        for sl, sk in STAT_ITEMS:
+            out.write(f"  {sl:<12s} {format_stat(sl, sk, a['stats'][sk]):>8s} {format_stat(sl, sk, o['stats'][sk]):>8s}\n")
+        for kind in ("players", "goalkeepers"):
+            for p in s.get(kind, ()):
+                items = [(sl, sk) for sl, sk in STAT_ITEMS if ("セーブ率" in sl) == (kind == "goalkeepers")]
+                out.write(f"  [{p['team']} No.{p['No.']}] " + "  ".join(f"{sl} {format_stat(sl, sk, p['stats'][sk])}" for sl, sk in items) + "\n")
+        out.write("\n")
+
+
+def _write_csv(summaries, out):
+    w = csv.writer(out)
+    w.writerow(["試合", "チーム", "No.", "得点"] + [sl for sl, _ in STAT_ITEMS])
+    for label, s in summaries.items():
+        for t in TEAMS:
+            ts = s["teams"][t]; w.writerow([label, ts["name"], "", ts["goals"]] + [ts["stats"][sk] for _, sk in STAT_ITEMS])
+        for p in s.get("players", ()) + s.get("goalkeepers", ()):
+            w.writerow([label, p["team"], p["No."], ""] + [p["stats"][sk] for _, sk in STAT_ITEMS])
+
+
+def cmd_stats(args):
+    matches = group_matches(read_records(args.csv))
+    if args.match: matches = {k: v for k, v in matches.items() if args.match in k}
+    summaries = {label: match_summary(recs, args.players) for label, recs in matches.items()}
+    if args.format == "json": json.dump(summaries, sys.stdout, ensure_ascii=False, indent=2); sys.stdout.write("\n")
+    elif args.format == "csv": _write_csv(summaries, sys.stdout)
+    else: _print_text(summaries, sys.stdout)
+    return 0 if summaries else 1
+
+
+def cmd_matches(args):
+    for label, recs in group_matches(read_records(args.csv)).items(): print(f"{label}\t{len(recs)}")
+    return 0
+
+
+def cmd_report(args):
+    # 描画系（matplotlib）はこのコマンドのときだけ読み込む
+    from handball.report import run_batch, find_fonts
+    matches = group_matches(read_records(args.csv))
+    if args.match: matches = {k: v for k, v in matches.items() if args.match in k}
+    if not matches: print("該当する試合がありません", file=sys.stderr); return 1
+    if not find_fonts(args.font): print("注意: 日本語フォントが見つからないため、日本語の文字は表示されません（--font で指定できます）", file=sys.stderr)
+    t0 = time.perf_counter()
+    for i, (label, path, n, sec) in enumerate(run_batch(matches, args.out, args.format, args.jobs, args.dpi, args.font), 1):
+        print(f"[{i}/{len(matches)}] {path}  ({n} 件, {sec:.2f} 秒)", flush=True)
+    print(f"{len(matches)} 試合を {time.perf_counter() - t0:.1f} 秒で出力しました", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="python -m handball", description="Handball analyst の一括集計")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("stats", help="試合ごとのスコアと STAT_ITEMS を出力する")
+    p.add_argument("csv", help=f"書き出した CSV（列: {', '.join(EXPORT_COLUMNS)}）。- で標準入力")
+    p.add_argument("--match", help="試合ラベルにこの文字列を含む試合だけ")
+    p.add_argument("--players", action="store_true", help="選手・GK ごとの行も出す")
+    p.add_argument("--format", choices=("text", "csv", "json"), default="text")
+    p.set_defaults(func=cmd_stats)
+    p = sub.add_parser("report", help="試合ごとのレポート（スコア・STAT_ITEMS・ヒートマップ・選手成績）を PNG/PDF で出力する")
+    p.add_argument("csv")
+    p.add_argument("-o", "--out", default="reports", help="出力先ディレクトリ（既定: reports）")
+    p.add_argument("--format", choices=("png", "pdf"), default="png")
+    p.add_argument("--jobs", type=int, default=None, help="並列プロセス数（既定: CPU コア数）")
+    p.add_argument("--match", help="試合ラベルにこの文字列を含む試合だけ")
+    p.add_argument("--dpi", type=int, default=150)
+    p.add_argument("--font", help="日本語フォント名（既定: インストール済みのものを自動で選ぶ）")
+    p.set_defaults(func=cmd_report)
+    p = sub.add_parser("matches", help="試合ラベルと記録数の一覧")
+    p.add_argument("csv")
+    p.set_defaults(func=cmd_matches)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,166 @@
+import math
+import numpy as np
+
+# ================================
+# コート定義と数学的ロジック
+# ================================
+# Streamlit は再実行のたびにスクリプト本体を評価し直すが、import したモジュールは
+# プロセス内で一度しか評価されない。ゾーンの多角形と辺の表はここで一度だけ作り、全セッションで共有する。
+# 判定は NumPy だけで行う（matplotlib は描画するときまで読み込まない）。
+GOAL_Y = 20.0
+HALF_GOAL = 1.5
+R6 = 6.0
+R9 = 9.0
+ARC_SAMPLES = 60
+
+ZONE_IDS = tuple(str(i) for i in range(1, 10))
+ZONE_LABELS = {
+    "1": (-8.5, 16.2), "2": (-5.2, 13.8), "3": (0, 13.0), "4": (5.2, 13.8), "5": (8.5, 16.2),
+    "6": (-7.0, 9.5), "7": (0, 9.5), "8": (7.0, 9.5), "9": (0, 18.5)
+}
+
+# (左端x, 右端x, 内側の半径, 外側の半径, 下端y)
+ZONE_SPECS = {
+    "1": (-10.0, -7.0, R6, R9, None), "2": (-7.0, -3.0, R6, R9, None),
+    "3": (-3.0, 3.0, R6, R9, None), "4": (3.0, 7.0, R6, R9, None),
+    "5": (7.0, 10.0, R6, R9, None), "6": (-10.0, -3.0, R9, None, 8.0),
+    "7": (-3.0, 3.0, R9, None, 8.0), "8": (3.0, 10.0, R9, None, 8.0),
+}
+SEVEN_M_BOX = ((-1.5, 19.5), (1.5, 19.5), (1.5, 17.5), (-1.5, 17.5))
+# 描画・クリック判定に使うコートの範囲（ゴール側の半面）
+COURT_XLIM = (-10.5, 10.5)
+COURT_YLIM = (7.5, 20.5)
+
+
+def _y_on_biarc(x: float, r: float):
+    if -HALF_GOAL <= x <= HALF_GOAL: return GOAL_Y - r
+    cx = -HALF_GOAL if x < -HALF_GOAL else HALF_GOAL
+    dx = x - cx
+    if abs(dx) > r: return None
+    y = GOAL_Y - math.sqrt(r**2 - dx**2)
+    return y if y <= GOAL_Y else None
+
+
+def biarc_y(xs, r):
+    # _y_on_biarc の NumPy 版。円弧の外側（|dx| > r）はマスクした masked array を返す
+    xs = np.asarray(xs, dtype=float)
+    dx = np.maximum(np.abs(xs) - HALF_GOAL, 0.0)
+    y = GOAL_Y - np.sqrt(np.maximum(r**2 - dx**2, 0.0))
+    return np.ma.masked_array(y, mask=dx > r)
+
+
+def _build_poly(xl, xr, ri, ro=None, yb=None):
+    xs = np.linspace(xl, xr, ARC_SAMPLES)
+    p = np.column_stack([xs, biarc_y(xs, ri).filled(GOAL_Y)])
+    if ro:
+        return np.vstack([p, np.column_stack([xs[::-1], biarc_y(xs[::-1], ro).filled(GOAL_Y)])])
+    if yb is not None:
+        return np.vstack([p, [(xr, yb), (xl, yb)]])
+    return p
+
+
+def _freeze(a):
+    a = np.ma.asarray(a, dtype=float) if np.ma.isMaskedArray(a) else np.asarray(a, dtype=float)
+    a.flags.writeable = False
+    return a
+
+
+def _build_zone_polys():
+    polys = {zid: _freeze(_build_poly(*spec)) for zid, spec in ZONE_SPECS.items()}
+    polys["9"] = _freeze(SEVEN_M_BOX)
+    return polys
+
+
+_ZONE_POLYS = _build_zone_polys()
+# 点線の枠線用に始点で閉じた座標列
+_ZONE_OUTLINES = {zid: _freeze(np.vstack([p, p[:1]])) for zid, p in _ZONE_POLYS.items()}
+
+
+def _edges(poly):
+    # 閉じた多角形の辺を (N, 4) 配列 [y0, y1, x0, dx/dy] で。水平な辺は半直線と交わらないので除く
+    a = poly; b = np.roll(poly, -1, axis=0)
+    keep = a[:, 1] != b[:, 1]; a, b = a[keep], b[keep]
+    return _freeze(np.column_stack([a[:, 1], b[:, 1], a[:, 0], (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])]))
+
+
+_ZONE_EDGES = {zid: _edges(p) for zid, p in _ZONE_POLYS.items()}
+# スカラー判定用（Python の float のタプルと外接矩形）
+_ZONE_EDGE_TUPLES = {zid: tuple(map(tuple, e.tolist())) for zid, e in _ZONE_EDGES.items()}
+_ZONE_BBOX = {zid: (*p.min(axis=0).tolist(), *p.max(axis=0).tolist()) for zid, p in _ZONE_POLYS.items()}
+_ZONE_PATHS = {}
+# 6mライン・9mライン（描画用に -10..10 を 400 分割）
+COURT_LINE_X = _freeze(np.linspace(-10, 10, 400))
+LINE_6M = _freeze(biarc_y(COURT_LINE_X, R6))
+LINE_9M = _freeze(biarc_y(COURT_LINE_X, R9))
+# ゾーンコード: 0 = どのゾーンにも属さない, 1..9 = ZONE_IDS の順
+_ZONE_BY_CODE = np.array([None] + list(ZONE_IDS), dtype=object)
+POINT_CHUNK = 4096  # 点 × 辺の一時配列を作る上限の点数
+
+
+def _inside(zid, x, y):
+    # 偶奇則（点から右へ伸ばした半直線が辺を何回横切るか）
+    x0, y0, x1, y1 = _ZONE_BBOX[zid]
+    if not (x0 <= x <= x1 and y0 <= y <= y1): return False
+    inside = False
+    for ay, by, ax, k in _ZONE_EDGE_TUPLES[zid]:
+        if (ay > y) != (by > y) and x < ax + k * (y - ay): inside = not inside
+    return inside
+
+
+def points_in_zone(zid, xs, ys):
+    # _inside の NumPy 版（点が少なければ点 × 辺を一度に判定）
+    xs = np.asarray(xs, dtype=float); ys = np.asarray(ys, dtype=float)
+    inside = np.zeros(xs.shape, dtype=bool)
+    x0, y0, x1, y1 = _ZONE_BBOX[zid]
+    cand = np.flatnonzero((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1))
+    if len(cand) > POINT_CHUNK:
+        # 点が多いときは辺ごとに全点をまとめて判定する（一時配列は点数分で済む）
+        px = xs[cand]; py = ys[cand]; hit = np.zeros(len(cand), dtype=bool)
+        for ay, by, ax, k in _ZONE_EDGE_TUPLES[zid]: hit ^= ((ay > py) != (by > py)) & (px < ax + k * (py - ay))
+        inside[cand] = hit
+    else:
+        ay, by, ax, k = _ZONE_EDGES[zid].T; px = xs[cand, None]; py = ys[cand, None]
+        inside[cand] = np.count_nonzero(((ay > py) != (by > py)) & (px < ax + k * (py - ay)), axis=1) & 1
+    return inside
+
+
+class HandballCourtEngine:
+    # 状態を持たないので毎回生成しても安い（幾何データはモジュールで共有）
+    def _y_on_biarc(self, x: float, r: float):
+        return _y_on_biarc(x, r)
+
+    def biarc_y(self, xs, r):
+        return biarc_y(xs, r)
+
+    def get_poly(self, zid):
+        # 読み取り専用の (N, 2) 配列を返す
+        return _ZONE_POLYS.get(zid)
+
+    def get_outline(self, zid):
+        return _ZONE_OUTLINES.get(zid)
+
+    def get_path(self, zid):
+        # 描画用の matplotlib Path（初めて使うときに作る）
+        if zid not in _ZONE_POLYS: return None
+        if zid not in _ZONE_PATHS:
+            from matplotlib.path import Path
+            _ZONE_PATHS[zid] = Path(_ZONE_POLYS[zid])
+        return _ZONE_PATHS[zid]
+
+    def find_zone_at(self, x, y):
+        x, y = float(x), float(y)
+        for zid in ZONE_IDS:
+            if _inside(zid, x, y): return zid
+        return None
+
+    def zone_codes_at(self, xs, ys):
+        # 座標配列をまとめて判定し int8 のゾーンコードを返す（重なりは find_zone_at と同じく番号の若い方を優先）
+        xs = np.ravel(np.asarray(xs, dtype=float)); ys = np.ravel(np.asarray(ys, dtype=float))
+        codes = np.zeros(len(xs), dtype=np.int8)
+        for code in range(len(ZONE_IDS), 0, -1):
+            codes[points_in_zone(ZONE_IDS[code - 1], xs, ys)] = code
+        return codes
+
+    def find_zones_at(self, xs, ys):
+        # zone_codes_at のゾーンID版（該当なしは None）
+        return _ZONE_BY_CODE[self.zone_codes_at(xs, ys)]
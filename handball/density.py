@@ -0,0 +1,104 @@
+from functools import lru_cache
+import numpy as np
+from handball.court import COURT_XLIM, COURT_YLIM
+from handball.timeline import KEYS, _key_codes
+
+# ================================
+# シュート位置の密度（コート座標の細かいマス目）
+# ================================
+# 記録のシュート位置 (X, Y) を BIN_M 四方のマスに割り当て、(チーム, 区分, 結果) ごとにマス別の件数を持つ。
+# チーム・区分・結果の絞り込みはこの件数表を足し合わせるだけなので、シーズン分の記録でも記録は読み直さない。
+# ログ末尾の未取り込み分だけを np.bincount でまとめて足す（Timeline と同じく、作り直し・縮みでは作り直す）。
+# 絞り込みごとのグリッド（なめらかにしたものを含む）は件数が変わるまでキャッシュする。
+BIN_M = 0.5
+SMOOTH_M = 0.75  # 密度をなめらかにするガウス核の幅（m）。0 ならマス目の件数のまま
+MIN_SHOTS = 3.0  # 成功率を出すマスの最低シュート数（なめらかにした件数で判定）
+SHOT_RESULTS = ("G", "O", "Save")
+FIELD_CATS = ("Set", "FB")
+
+
+@lru_cache(maxsize=32)
+def _blur_matrix(n, sigma):
+    # 1 次元のガウス核を行列にしたもの（列ごとに和が 1 なので、端のマスでも件数の合計は変わらない）
+    i = np.arange(n, dtype=float)
+    k = np.exp(-0.5 * ((i[:, None] - i[None, :]) / sigma) ** 2)
+    k /= k.sum(axis=0, keepdims=True)
+    k.flags.writeable = False
+    return k
+
+
+class DensityGrid:
+    # 1 つの絞り込みのマス目。配列はすべて (ny, nx)、行 0 がコートの下端（COURT_YLIM[0]）
+    def __init__(self, shots, goals, bin_m, smooth_m):
+        self.shots = shots
+        self.goals = goals
+        self.total = int(shots.sum())
+        self.extent = (*COURT_XLIM, *COURT_YLIM)
+        if smooth_m > 0:
+            ky = _blur_matrix(shots.shape[0], smooth_m / bin_m); kx = _blur_matrix(shots.shape[1], smooth_m / bin_m)
+            self.smooth_shots = ky @ shots @ kx.T; self.smooth_goals = ky @ goals @ kx.T
+        else:
+            self.smooth_shots = shots.astype(float); self.smooth_goals = goals.astype(float)
+        for a in (self.shots, self.goals, self.smooth_shots, self.smooth_goals): a.flags.writeable = False
+
+    def density(self):
+        # 各マスがシュート全体に占める割合（合計 1）
+        return self.smooth_shots / max(1, self.total)
+
+    def rate(self, min_shots=MIN_SHOTS):
+        # マスごとの成功率（0〜1）。シュートが min_shots に満たないマスは NaN
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = self.smooth_goals / self.smooth_shots
+        r[~(self.smooth_shots >= min_shots)] = np.nan
+        return r
+
+    def key(self):
+        # 描画キャッシュ用（同じ件数のマス目なら同じキー）
+        return (self.shots.shape, self.shots.tobytes(), self.goals.tobytes())
+
+
+class ShotDensity:
+    def __init__(self, bin_m=BIN_M, smooth_m=SMOOTH_M):
+        self.bin_m = bin_m
+        self.smooth_m = smooth_m
+        self.nx = int(round((COURT_XLIM[1] - COURT_XLIM[0]) / bin_m))
+        self.ny = int(round((COURT_YLIM[1] - COURT_YLIM[0]) / bin_m))
+        self.n = 0                                                            # 取り込み済みのログ行数
+        self.m = 0                                                            # マス目に入った記録数（座標のない行は除く）
+        self.counts = np.zeros((len(KEYS), self.ny * self.nx), dtype=np.int32)  # KEYS ごとのマス別件数
+        self._grids = {}
+
+    def bins(self, xs, ys):
+        # 座標 -> マスの番号（iy * nx + ix）。コートの外・NaN は -1
+        xs = np.asarray(xs, dtype=float); ys = np.asarray(ys, dtype=float)
+        with np.errstate(invalid="ignore"):
+            ix = np.floor((xs - COURT_XLIM[0]) / self.bin_m); iy = np.floor((ys - COURT_YLIM[0]) / self.bin_m)
+            ok = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        return np.where(ok, iy * self.nx + ix, -1).astype(np.int64)
+
+    def sync(self, log):
+        # ログ末尾の未取り込み分を足す（件数は Timeline.sync と同じく一度だけ読む）
+        n = len(log)
+        if n < self.n or getattr(log, "uid", None) != getattr(self, "_uid", None):
+            self.__init__(self.bin_m, self.smooth_m); self._uid = getattr(log, "uid", None)
+        if n == self.n: return self
+        xy = log.coords()[self.n:n]; keys = _key_codes(log, self.n, n); self.n = n
+        bins = self.bins(xy[:, 0], xy[:, 1]); ok = (keys >= 0) & (bins >= 0)
+        if ok.any():
+            flat = keys[ok] * self.counts.shape[1] + bins[ok]
+            self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape).astype(np.int32)
+            self.m += int(ok.sum()); self._grids.clear()
+        return self
+
+    def _sum(self, team, cats, results):
+        rows = [i for i, (t, c, r) in enumerate(KEYS) if t == team and c in cats and r in results]
+        return self.counts[rows].sum(axis=0).reshape(self.ny, self.nx)
+
+    def grid(self, team, cats=FIELD_CATS):
+        # team のシュート（G / O / Save）のマス目。cats は区分（既定は 7m を除くフィールドシュート）
+        key = (team, tuple(cats))
+        g = self._grids.get(key)
+        if g is None:
+            g = self._grids[key] = DensityGrid(self._sum(team, cats, SHOT_RESULTS), self._sum(team, cats, ("G",)), self.bin_m, self.smooth_m)
+        return g
+
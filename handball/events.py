@@ -0,0 +1,154 @@
+import itertools
+import numpy as np
+from handball.schema import LOG_COLUMNS, COORD_COLUMNS, FIXED_CATEGORIES, is_missing as _is_missing, parse_clock, parse_coord
+
+# ================================
+# イベントログ（列指向・追記専用）
+# ================================
+# 1 行あたりのメモリは列数 × 2 バイト + id と試合時間（秒）の 16 バイト + 座標の 8 バイトで一定になる（文字列の列はすべて小さな整数コード）。
+# シュート位置（X, Y）は float32 の (行数, 2) 配列に持つ（座標のない行は NaN）。
+# 共有中の試合では別のセッションのスレッドが追記する。読む側は最初に件数を一度だけ読み、その件数で切って使う
+# （n は各列を書き終えてから増やすので、n 件目までは常に書き込み済み）。
+# 値の種類が決まっている列（FIXED_CATEGORIES）は先にコードを割り当てておく（コード = タプル内の位置）。
+MISSING = -1  # None / NaN のコード
+_log_uids = itertools.count()
+
+
+class _CodedColumn:
+    # 値 -> コードの辞書と、コードの配列。コードが int16 に収まらなくなったら int32 に広げる
+    def __init__(self, categories=(), capacity=256):
+        self.categories = list(categories)
+        self.index = {v: i for i, v in enumerate(self.categories)}
+        self.codes = np.full(capacity, MISSING, dtype=np.int16)
+
+    def encode(self, v):
+        if _is_missing(v): return MISSING
+        code = self.index.get(v)
+        if code is None:
+            code = self.index[v] = len(self.categories); self.categories.append(v)
+            if code > np.iinfo(self.codes.dtype).max: self.codes = self.codes.astype(np.int32)
+        return code
+
+    def code_of(self, v):
+        # 未登録の値は -2（どの行にも一致しない）
+        return MISSING if _is_missing(v) else self.index.get(v, -2)
+
+    def decode(self, code):
+        return None if code < 0 else self.categories[code]
+
+    def grow(self, capacity):
+        codes = np.full(capacity, MISSING, dtype=self.codes.dtype); codes[:len(self.codes)] = self.codes
+        self.codes = codes
+
+
+class EventLog:
+    def __init__(self, capacity=256):
+        self.uid = next(_log_uids)
+        self.n = 0
+        self.columns = {c: _CodedColumn(FIXED_CATEGORIES.get(c, ()), capacity) for c in LOG_COLUMNS if c != "id" and c not in COORD_COLUMNS}
+        self.ids = np.full(capacity, MISSING, dtype=np.int64)
+        self.secs = np.full(capacity, np.nan)  # 時間の列を秒にしたもの（読めない値は NaN）
+        self.xy = np.full((capacity, 2), np.nan, dtype=np.float32)  # シュート位置（m）
+
+    @classmethod
+    def from_records(cls, records):
+        log = cls(capacity=max(256, len(records)))
+        for r in records: log.append(r)
+        return log
+
+    @property
+    def version(self):
+        # 表示キャッシュの依存キー（ログの作り直しと追記で変わる）
+        return (self.uid, self.n)
+
+    # --- list of dict と同じように扱うためのインターフェース ---
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.n))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice): return [self.row(i) for i in range(*key.indices(self.n))]
+        if key < 0: key += self.n
+        if not 0 <= key < self.n: raise IndexError(key)
+        return self.row(key)
+
+    def row(self, i):
+        r = {c: col.decode(int(col.codes[i])) for c, col in self.columns.items()}
+        r["id"] = None if self.ids[i] == MISSING else int(self.ids[i])
+        # float32 に丸めた分は cm 単位に戻す
+        for c, v in zip(COORD_COLUMNS, self.xy[i].tolist()): r[c] = None if v != v else round(v, 2)
+        return {c: r[c] for c in LOG_COLUMNS}
+
+    def append(self, record):
+        if self.n == len(self.ids): self._grow(2 * len(self.ids))
+        i = self.n
+        for c, col in self.columns.items(): col.codes[i] = col.encode(record.get(c))
+        rid = record.get("id")
+        self.ids[i] = MISSING if _is_missing(rid) else int(rid)
+        sec = parse_clock(record.get("時間")); self.secs[i] = np.nan if sec is None else sec
+        x, y = (parse_coord(record.get(c)) for c in COORD_COLUMNS)
+        if x is not None or y is not None: self.xy[i] = (np.nan if x is None else x, np.nan if y is None else y)
+        self.n += 1
+        return i
+
+    def _grow(self, capacity):
+        for col in self.columns.values(): col.grow(capacity)
+        ids = np.full(capacity, MISSING, dtype=np.int64); ids[:len(self.ids)] = self.ids
+        self.ids = ids
+        secs = np.full(capacity, np.nan); secs[:len(self.secs)] = self.secs
+        self.secs = secs
+        xy = np.full((capacity, 2), np.nan, dtype=np.float32); xy[:len(self.xy)] = self.xy
+        self.xy = xy
+
+    # --- 列指向の読み出し ---
+    def codes(self, column):
+        # 書き込み不可のビュー（コピーしない）
+        v = (self.ids if column == "id" else self.columns[column].codes)[:self.n].view()
+        v.flags.writeable = False
+        return v
+
+    def seconds(self):
+        # 試合時間（秒）の書き込み不可ビュー
+        v = self.secs[:self.n].view()
+        v.flags.writeable = False
+        return v
+
+    def coords(self):
+        # シュート位置 (行数, 2) の書き込み不可ビュー（座標のない行は NaN）
+        v = self.xy[:self.n].view()
+        v.flags.writeable = False
+        return v
+
+    def eq(self, column, value):
+        if column == "id": return self.codes("id") == value
+        return self.codes(column) == self.columns[column].code_of(value)
+
+    def isin(self, column, values):
+        col = self.columns[column]
+        return np.isin(self.codes(column), [col.code_of(v) for v in values])
+
+    def mask(self, **conds):
+        # 例: log.mask(チーム="味方", ピリオド="前半")。途中で追記されても長さは呼び出し時点の件数
+        n = self.n; m = np.ones(n, dtype=bool)
+        for c, v in conds.items(): m &= self.eq(c, v)[:n]
+        return m
+
+    def to_frame(self, mask=None, start=0, stop=None, columns=LOG_COLUMNS, categorical=True):
+        # categorical=True ならコード配列をそのまま pd.Categorical として渡す。False なら文字列に戻した列にする
+        import pandas as pd  # 表にするときだけ読み込む（集計・CLI は pandas なしで動く）
+        # 読む件数を最初に決める（mask はその長さ、なければ呼び出し時点の件数）。列ごとに長さがずれないように
+        n = self.n if mask is None else len(mask)
+        sel = slice(start, n if stop is None else min(stop, n)) if mask is None else mask
+        data = {}
+        for c in columns:
+            if c == "id": data[c] = self.codes("id")[:n][sel]; continue
+            if c in COORD_COLUMNS: data[c] = np.round(self.coords()[:n][sel, COORD_COLUMNS.index(c)].astype(float), 2); continue
+            col = self.columns[c]; codes = self.codes(c)[:n][sel]
+            cat = pd.Categorical.from_codes(codes, categories=pd.Index(col.categories, dtype=object), validate=False)
+            data[c] = cat if categorical else np.asarray(cat.astype(object))
+        return pd.DataFrame(data, columns=list(columns))
+
+    def memory_bytes(self):
+        return self.ids.nbytes + self.secs.nbytes + self.xy.nbytes + sum(col.codes.nbytes for col in self.columns.values())
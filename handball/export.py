@@ -0,0 +1,45 @@
+import threading
+from handball.events import EventLog
+from handball.schema import EXPORT_COLUMNS
+
+# ================================
+# CSV 書き出し
+# ================================
+# 出力形式は従来の DataFrame(logs).drop(columns=['id']).to_csv(index=False).encode('utf-8-sig') と同じ。
+CSV_BOM = "\ufeff".encode("utf-8")
+CHUNK_ROWS = 50_000
+
+
+def iter_csv(logs, chunk_rows=CHUNK_ROWS):
+    # logs は EventLog 1 つか、複数試合分の EventLog の並び。chunk_rows 行ずつ bytes を返す
+    if isinstance(logs, EventLog): logs = (logs,)
+    header = True
+    for log in logs:
+        n = len(log)
+        for a in range(0, n, chunk_rows):
+            chunk = log.to_frame(start=a, stop=min(a + chunk_rows, n), columns=EXPORT_COLUMNS).to_csv(index=False, header=header)
+            yield (CSV_BOM if header else b"") + chunk.encode("utf-8")
+            header = False
+
+
+def write_csv(fp, logs, chunk_rows=CHUNK_ROWS):
+    # ファイル全体をメモリに載せずに書き出す（fp はバイナリモードのファイル）
+    written = 0
+    for chunk in iter_csv(logs, chunk_rows): fp.write(chunk); written += len(chunk)
+    return written
+
+
+class CsvExportCache:
+    # ログ件数が変わったときだけ CSV を作り直す
+    def __init__(self):
+        self._log = None
+        self._n = -1
+        self._data = b""
+        self._lock = threading.Lock()
+
+    def get(self, log):
+        with self._lock:
+            n = len(log)
+            if log is not self._log or n != self._n:
+                self._data = b"".join(iter_csv(log)); self._log = log; self._n = n
+            return self._data
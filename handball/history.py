@@ -0,0 +1,118 @@
+import json
+import sqlite3
+import threading
+from handball.schema import MATCH_KEYS, clean_cell as _cell, match_label
+from handball.sheet_sync import open_worksheet, SheetSyncError
+
+# ================================
+# 過去試合データベース（シートのローカル索引）
+# ================================
+# シートの行を試合ごとに SQLite に取り込み、日付・相手校・試合名で索引する。
+# 取り込み済みの行数を覚えておき、次回はシートの続きの行だけを読む（シートは追記専用の前提）。
+
+
+def _col_letter(n):
+    s = ""
+    while n: n, r = divmod(n - 1, 26); s = chr(65 + r) + s
+    return s
+
+
+class HistoryStore:
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS matches (match_id INTEGER PRIMARY KEY, 日付 TEXT, 試合名 TEXT, 相手校 TEXT, label TEXT UNIQUE, n_events INTEGER DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS matches_date ON matches (日付);
+            CREATE INDEX IF NOT EXISTS matches_opp ON matches (相手校);
+            CREATE INDEX IF NOT EXISTS matches_title ON matches (試合名);
+            CREATE TABLE IF NOT EXISTS events (match_id INTEGER NOT NULL, row TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS events_match ON events (match_id);
+        """)
+
+    def _meta(self, key, default=None):
+        r = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(r[0]) if r else default
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False)))
+
+    @property
+    def rows_loaded(self):
+        with self._lock: return self._meta("rows_loaded", 0)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM events"); self._db.execute("DELETE FROM matches"); self._db.execute("DELETE FROM meta")
+
+    def import_rows(self, header, rows):
+        # rows はシートの続きの行（header の列順）。新しく取り込んだ行数を返す
+        header = [str(h) for h in header]
+        with self._lock, self._db:
+            if self._meta("header") not in (None, header):
+                raise ValueError("シートの列構成が変わっています。全件を再読込してください。")
+            self._set_meta("header", header)
+            ids = {}; added = 0
+            for values in rows:
+                rec = {h: _cell(v) for h, v in zip(header, values)}
+                if not any(v is not None for v in rec.values()): continue
+                key = tuple(rec.get(k) for k in MATCH_KEYS)
+                mid = ids.get(key)
+                if mid is None:
+                    label = match_label(*key)
+                    self._db.execute("INSERT OR IGNORE INTO matches (日付, 試合名, 相手校, label) VALUES (?, ?, ?, ?)", (*key, label))
+                    mid = ids[key] = self._db.execute("SELECT match_id FROM matches WHERE label = ?", (label,)).fetchone()[0]
+                self._db.execute("INSERT INTO events (match_id, row) VALUES (?, ?)", (mid, json.dumps(rec, ensure_ascii=False)))
+                self._db.execute("UPDATE matches SET n_events = n_events + 1 WHERE match_id = ?", (mid,))
+                added += 1
+            self._set_meta("rows_loaded", self._meta("rows_loaded", 0) + len(rows))
+        return added
+
+    def import_frame(self, df):
+        return self.import_rows(list(df.columns), df.values.tolist())
+
+    def refresh(self, conn, full=False):
+        # サービスアカウント接続ならシートの続きの行だけを読む。できなければ全件を読み直す
+        try:
+            ws = open_worksheet(conn)
+        except SheetSyncError:
+            self.clear()
+            return self.import_frame(conn.read(ttl=0))
+        header = ws.row_values(1)
+        if full or self._meta("header") not in (None, header): self.clear()
+        start = self.rows_loaded + 2
+        rows = ws.get_values(f"A{start}:{_col_letter(len(header))}") if header else []
+        return self.import_rows(header, rows)
+
+    def matches(self, date=None, opponent=None, title=None):
+        # 条件に合う試合のラベルを、シートに最初に現れた順で返す
+        conds, args = [], []
+        for col, v in (("日付", date), ("相手校", opponent), ("試合名", title)):
+            if v is not None: conds.append(f"{col} = ?"); args.append(v)
+        where = f"WHERE {' AND '.join(conds)}" if conds else ""
+        with self._lock:
+            return [r[0] for r in self._db.execute(f"SELECT label FROM matches {where} ORDER BY match_id", args)]
+
+    def opponents(self):
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT DISTINCT 相手校 FROM matches WHERE 相手校 IS NOT NULL ORDER BY 相手校")]
+
+    def match_logs(self, label):
+        with self._lock:
+            r = self._db.execute("SELECT match_id FROM matches WHERE label = ?", (label,)).fetchone()
+            if r is None: return []
+            return [json.loads(row) for (row,) in self._db.execute("SELECT row FROM events WHERE match_id = ? ORDER BY rowid", (r[0],))]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store(path):
+    # 同じファイルの HistoryStore は全セッションで共有する
+    with _stores_lock:
+        if str(path) not in _stores: _stores[str(path)] = HistoryStore(path)
+        return _stores[str(path)]
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import weakref
+import zlib
+from datetime import datetime
+from pathlib import Path
+from handball.events import EventLog
+
+# ================================
+# 試合記録のジャーナル（追記専用・クラッシュ後に再生して復元）
+# ================================
+# 1 行 = 1 操作。"event" は確定した記録の追記、それ以外は名簿・退場・時計などの最新値（後勝ち）。
+# 各行は書いた時点で OS に渡すので、プロセスが落ちても失われない。電源断に備えた fsync は
+# 共通のスレッドが FSYNC_SEC ごとにまとめて行う（記録の確定は fsync を待たない）。
+# 行頭の CRC が合わない行（書きかけの末尾）で再生を止め、そこから先は切り捨てて追記を続ける。
+FSYNC_SEC = 0.5
+JOURNAL_KEEP = 30  # 記録のないジャーナルを残しておく数（記録のあるジャーナルは消さない）
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_ID_RE = re.compile(r"\d{8}_\d{6}_[0-9a-f]{6}")  # new_journal_id() の形式（URL の ?j= はこれ以外受け付けない）
+
+
+def new_journal_id():
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(3)}"
+
+
+def _encode(op):
+    payload = json.dumps(op, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n".encode("utf-8")
+
+
+def _decode(line):
+    # 壊れた行なら None
+    try:
+        crc, payload = line.rstrip(b"\n").split(b" ", 1)
+        if int(crc, 16) != zlib.crc32(payload): return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logs = EventLog()
+        self.values = {}
+        self._last = {}  # put() で最後に書いた値（JSON 文字列）
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._replay()
+        self._fp = open(self.path, "ab")
+        _flusher.add(self)
+
+    @property
+    def id(self):
+        return self.path.name[:-len(JOURNAL_SUFFIX)]
+
+    def _replay(self):
+        # ファイルを先頭から読み、ログと最新値を組み立てる。書きかけの末尾は切り捨てる
+        if not self.path.exists(): return
+        good = 0
+        with open(self.path, "rb") as fp:
+            for line in fp:
+                op = _decode(line) if line.endswith(b"\n") else None
+                if op is None: break
+                good += len(line)
+                if op["k"] == "event": self.logs.append(op["v"])
+                else: self.values[op["k"]] = op["v"]; self._last[op["k"]] = json.dumps(op["v"], ensure_ascii=False, sort_keys=True)
+        if good < self.path.stat().st_size:
+            with open(self.path, "r+b") as fp: fp.truncate(good)
+
+    def _write(self, op):
+        data = _encode(op)
+        with self._lock:
+            self._fp.write(data); self._fp.flush(); self._dirty = True
+
+    def event(self, record):
+        self._write({"k": "event", "v": record})
+
+    def put(self, kind, value):
+        # 前回書いた値と同じなら何もしない（毎回呼んでも追記は変化したときだけ）
+        s = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+        if self._last.get(kind) == s: return False
+        self._last[kind] = s; self.values[kind] = value
+        self._write({"k": kind, "v": value})
+        return True
+
+    def sync(self):
+        with self._lock:
+            if not self._dirty or self._fp.closed: return
+            self._dirty = False
+            os.fsync(self._fp.fileno())
+
+    def close(self):
+        self.sync()
+        with self._lock: self._fp.close()
+        _flusher.discard(self)
+
+
+class _Flusher(threading.Thread):
+    # 開いている全ジャーナルをまとめて fsync する共通スレッド
+    def __init__(self, interval=FSYNC_SEC):
+        super().__init__(daemon=True, name="journal-fsync")
+        self.interval = interval
+        self._journals = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def add(self, journal):
+        with self._lock:
+            self._journals.add(journal)
+            if not self.is_alive(): self.start()
+
+    def discard(self, journal):
+        with self._lock: self._journals.discard(journal)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock: journals = list(self._journals)
+            for j in journals:
+                try: j.sync()
+                except (OSError, ValueError): pass
+
+
+_flusher = _Flusher()
+
+
+def is_journal_id(jid):
+    return isinstance(jid, str) and JOURNAL_ID_RE.fullmatch(jid) is not None
+
+
+def journal_path(directory, jid):
+    # ID はファイル名になるので、形式に合わないもの（パス区切り・".." など）は拒否する
+    if not is_journal_id(jid): raise ValueError(f"不正なジャーナル ID: {jid!r}")
+    return Path(directory) / f"{jid}{JOURNAL_SUFFIX}"
+
+
+def list_journals(directory):
+    # 新しい順に (id, 更新時刻, バイト数)
+    files = sorted(Path(directory).glob(f"*{JOURNAL_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True) if Path(directory).exists() else []
+    return [(p.name[:-len(JOURNAL_SUFFIX)], p.stat().st_mtime, p.stat().st_size) for p in files if is_journal_id(p.name[:-len(JOURNAL_SUFFIX)])]
+
+
+def has_events(path):
+    # 記録（"event" の行）が 1 件でもあるか。最初に見つかったところで読むのをやめる
+    tag = b' {"k":"event",'
+    try:
+        with open(path, "rb") as fp: return any(tag in line[:32] for line in fp)
+    except FileNotFoundError:
+        return False
+
+
+def prune_journals(directory, keep=JOURNAL_KEEP, protect=()):
+    # 新しい順に keep 個より古い、記録のないジャーナル（開いただけ・時計や試合情報だけのもの）を消す。
+    # 記録のあるジャーナルは数にかかわらず残す
+    for jid, _, _ in list_journals(directory)[keep:]:
+        path = journal_path(directory, jid)
+        if jid not in protect and not has_events(path): path.unlink(missing_ok=True)
@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+import time
+from handball.sheet_sync import SYNC_KEY, BATCH_ROWS, sheet_frame, ensure_header, append_batch
+
+# ================================
+# 送信キュー（ディスク上の outbox）とバックグラウンド送信
+# ================================
+# 記録側は outbox に行を書き込むだけで戻り、ネットワークを待たない。
+# 送信スレッドが outbox の先頭から順に追記し、シートに載った行だけを outbox から消す。
+# 送信できなかった行はディスクに残るので、回線断やプロセス再起動でも失われない。
+POLL_SEC = 2.0
+MAX_BACKOFF_SEC = 60.0
+
+
+class Outbox:
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, sync_key TEXT UNIQUE, row TEXT NOT NULL)")
+
+    def put(self, records):
+        # 同じ sync_key の行は二重に積まない
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO outbox (sync_key, row) VALUES (?, ?)",
+                                 [(r[SYNC_KEY], json.dumps(r, ensure_ascii=False)) for r in records])
+            return self._db.total_changes - before
+
+    def peek(self, limit):
+        with self._lock:
+            rows = self._db.execute("SELECT seq, row FROM outbox ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [(seq, json.loads(row)) for seq, row in rows]
+
+    def ack(self, seqs):
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+def spool_logs(outbox, log, start, match_id=None):
+    # log[start:] を送信用の行にして outbox に積む。積んだ後のログ位置を返す（match_id は sync_key に使う試合 ID）
+    n = len(log)
+    if start < n: outbox.put(sheet_frame(log, start, n, match_id).fillna("").to_dict("records"))
+    return n
+
+
+class SheetUploader(threading.Thread):
+    def __init__(self, outbox, ws_factory, batch_rows=BATCH_ROWS, poll_sec=POLL_SEC, max_backoff=MAX_BACKOFF_SEC):
+        super().__init__(daemon=True, name="sheet-uploader")
+        self.outbox = outbox
+        self.ws_factory = ws_factory
+        self.batch_rows = batch_rows
+        self.poll_sec = poll_sec
+        self.max_backoff = max_backoff
+        self.last_latency = None     # 直近に成功した送信の所要時間（秒）
+        self.last_flush_at = None
+        self.last_error = None
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stop_evt = threading.Event()
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop_evt.set(); self._wake.set()
+
+    def status(self):
+        return {"depth": len(self.outbox), "last_latency": self.last_latency, "last_flush_at": self.last_flush_at,
+                "last_error": self.last_error, "failures": self.failures}
+
+    def run(self):
+        ws = header = None
+        verify = True  # 起動直後は前回の途中終了に備えてシート上の sync_key と突き合わせる
+        while not self._stop_evt.is_set():
+            batch = self.outbox.peek(self.batch_rows)
+            if not batch:
+                self._wake.wait(self.poll_sec); self._wake.clear()
+                continue
+            try:
+                t0 = time.perf_counter()
+                if ws is None:
+                    ws = self.ws_factory(); header = ensure_header(ws)
+                rows = [[r.get(c, "") for c in header] for _, r in batch]
+                append_batch(ws, rows, [r[SYNC_KEY] for _, r in batch], header.index(SYNC_KEY) + 1, verify, 0, 0, None)
+                self.outbox.ack([seq for seq, _ in batch])
+                self.last_latency = time.perf_counter() - t0; self.last_flush_at = time.time()
+                self.last_error = None; self.failures = 0; verify = False
+            except Exception as e:
+                # 接続を作り直し、次回は重複確認してから送る
+                ws = None; verify = True
+                self.failures += 1; self.last_error = f"{type(e).__name__}: {e}"
+                self._stop_evt.wait(min(self.max_backoff, self.poll_sec * 2 ** (self.failures - 1)))
+
+
+_uploaders = {}
+_uploaders_lock = threading.Lock()
+
+
+def get_uploader(path, ws_factory):
+    # outbox ファイルごとに送信スレッドを 1 本だけ起動し、全セッションで共有する
+    key = str(path)
+    with _uploaders_lock:
+        up = _uploaders.get(key)
+        if up is None or not up.is_alive():
+            up = _uploaders[key] = SheetUploader(Outbox(key), ws_factory); up.start()
+        return up
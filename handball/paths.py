@@ -0,0 +1,13 @@
+import os
+from pathlib import Path
+
+# ================================
+# ローカル保存先
+# ================================
+# 送信キューや履歴キャッシュなど、サーバ側に残すファイルの置き場所
+DATA_DIR = Path(os.environ.get("HANDBALL_DATA_DIR", ".handball_data"))
+
+
+def data_path(name):
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    return DATA_DIR / name
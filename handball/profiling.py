@@ -0,0 +1,81 @@
+import functools
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+# ================================
+# 再実行ごとの処理時間の計測
+# ================================
+# mark(name) で「ここから name の区間」と印を付けていく。無効のときは属性を 1 つ見て戻るだけ。
+# 直近 window 回分の所要時間を区間ごとに持ち、パーセンタイルと JSON で取り出せる。
+WINDOW = 200
+_NULL = nullcontext()
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals: return 0.0
+    k = (len(sorted_vals) - 1) * q; lo = int(k); hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+class Profiler:
+    def __init__(self, window=WINDOW):
+        self.enabled = False
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self._cur = None
+        self._t = 0.0
+        self._run_t = None
+
+    def begin_run(self):
+        if not self.enabled: return
+        self._cur = None; self._run_t = time.perf_counter()
+
+    def end_run(self):
+        if not self.enabled or self._run_t is None: return
+        self.stop(); self.samples["(再実行全体)"].append(time.perf_counter() - self._run_t); self._run_t = None
+
+    def mark(self, name):
+        # 直前の区間を閉じて name の区間を始める（name=None なら閉じるだけ）
+        if not self.enabled: return
+        now = time.perf_counter()
+        if self._cur is not None: self.samples[self._cur].append(now - self._t)
+        self._cur = name; self._t = now
+
+    def stop(self):
+        self.mark(None)
+
+    @contextmanager
+    def _timed(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - t0)
+
+    def section(self, name):
+        return self._timed(name) if self.enabled else _NULL
+
+    def timed(self, name):
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.section(name): return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def summary(self):
+        # 区間ごとの n / p50 / p90 / p99 / max（ミリ秒）
+        out = {}
+        for name, vals in self.samples.items():
+            v = sorted(vals)
+            out[name] = {"n": len(v), "p50": _percentile(v, 0.5) * 1e3, "p90": _percentile(v, 0.9) * 1e3,
+                         "p99": _percentile(v, 0.99) * 1e3, "max": (v[-1] if v else 0.0) * 1e3}
+        return out
+
+    def to_json(self):
+        return json.dumps({"summary_ms": self.summary(), "samples_sec": {k: list(v) for k, v in self.samples.items()},
+                           "exported_at": time.time()}, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        self.samples.clear()
@@ -0,0 +1,165 @@
+import io
+import threading
+from collections import OrderedDict
+import numpy as np
+from handball.court import HandballCourtEngine, ZONE_IDS, ZONE_LABELS, COURT_LINE_X, LINE_6M, LINE_9M, COURT_XLIM, COURT_YLIM
+
+# ================================
+# コート描画と描画済み画像のキャッシュ
+# ================================
+# pyplot はスレッド間で状態を共有するため、ここでは Figure を直接生成する。
+# pyplot に登録されないので、参照が切れればそのまま解放される。
+# matplotlib・PIL は初めて描画するときに読み込む（import handball.render だけなら軽い）。
+engine = HandballCourtEngine()
+
+
+class ImageCache:
+    # キー付きの LRU キャッシュ。maxsize を超えたら最も古く使われたものから捨てる
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key); self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        # 描画はロックの外で行う（同じキーが同時に描画されても結果は同一）
+        value = render()
+        with self._lock:
+            self._data[key] = value; self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock: self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def draw_court_base(ax):
+    ax.plot([-10, 10, 10, -10, -10], [0, 0, 20, 20, 0], color="black", linewidth=2.5)
+    ax.plot(COURT_LINE_X, LINE_6M, color="black", linewidth=2.2, zorder=3)
+    ax.plot(COURT_LINE_X, LINE_9M, "--", color="black", alpha=0.5, zorder=3)
+    ax.set_xlim(*COURT_XLIM); ax.set_ylim(*COURT_YLIM); ax.set_aspect("equal"); ax.axis("off")
+
+
+def fig_to_png(fig, **kwargs):
+    # 保存したら Figure の中身を捨てる（呼び出し側は Figure を使い回さない）
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format="png", **kwargs)
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def render_court_preview_png(selected_zone):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(5, 3.5)); ax = fig.subplots(); draw_court_base(ax)
+    for zid, pos in ZONE_LABELS.items():
+        p = engine.get_poly(zid); o = engine.get_outline(zid); is_selected = selected_zone == zid
+        ax.fill(p[:,0], p[:,1], color="#f39c12" if is_selected else "#fdf2e9", alpha=0.8 if is_selected else 0.3, zorder=1)
+        ax.plot(o[:,0], o[:,1], color="gray", linewidth=0.8, linestyle=":", zorder=2)
+        ax.text(pos[0], pos[1], "7m" if zid == "9" else zid, ha='center', va='center', fontsize=12, fontweight='bold', color="#2c3e50", zorder=4)
+    return fig_to_png(fig, bbox_inches='tight', pad_inches=0.1)
+
+
+def _decode_png(png):
+    from PIL import Image
+    img = Image.open(io.BytesIO(png)); img.load()
+    return img
+
+
+# 選択ゾーンは「未選択」+ 9 ゾーンの 10 通りしかないので全て保持できる大きさにする
+preview_cache = ImageCache(maxsize=12)
+
+
+def court_preview_image(selected_zone):
+    return preview_cache.get_or_render(selected_zone, lambda: _decode_png(render_court_preview_png(selected_zone)))
+
+
+# ================================
+# ヒートマップ（ゾーンごとの件数をキーにした描画キャッシュ）
+# ================================
+# 図の内容はチームと各ゾーンの (記録数, シュート数, ゴール数) だけで決まる。
+# 同じ件数の組み合わせなら、どのセッション・過去試合でも描画済みの PNG を返す。
+HEAT_ZONES = ZONE_IDS[:8]
+HEAT_NORM_BOUNDS = np.arange(0, 1.2, 0.1)
+
+
+def heatmap_counts(stats, t_name):
+    return (max(1, stats.non_7m_zone_total(t_name)),) + tuple(stats.zone_counts(t_name, zid) for zid in HEAT_ZONES)
+
+
+def draw_heatmap(ax, t_name, counts):
+    from matplotlib import colormaps
+    from matplotlib.colors import BoundaryNorm
+    import matplotlib.patheffects as pe
+    draw_court_base(ax)
+    total = counts[0]; cmap = colormaps["Blues"] if t_name == "味方" else colormaps["Reds"]; norm = BoundaryNorm(HEAT_NORM_BOUNDS, cmap.N)
+    for zid, (z_n, z_sh, z_g) in zip(HEAT_ZONES, counts[1:]):
+        pos = ZONE_LABELS[zid]; p = engine.get_poly(zid); o = engine.get_outline(zid); share = z_n/total
+        ax.fill(p[:,0], p[:,1], color=cmap(norm(share)) if z_n else "#fdf2e9", alpha=0.8 if z_n else 0.3, zorder=1)
+        ax.plot(o[:,0], o[:,1], color="gray", linewidth=0.8, linestyle=":", zorder=2)
+        if z_sh:
+            r = z_g/z_sh
+            ax.text(pos[0], pos[1], f"{r*100:.0f}", ha='center', va='center', fontsize=10, fontweight='bold', zorder=5).set_path_effects([pe.withStroke(linewidth=2, foreground="white")])
+
+
+def render_heatmap_png(t_name, counts):
+    # st.pyplot と同じ保存設定（bbox_inches="tight", dpi=200）
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(5, 4)); draw_heatmap(fig.subplots(), t_name, counts)
+    return fig_to_png(fig, bbox_inches="tight", dpi=200)
+
+
+heatmap_cache = ImageCache(maxsize=128)
+
+
+def heatmap_png(t_name, stats):
+    counts = heatmap_counts(stats, t_name)
+    return heatmap_cache.get_or_render((t_name, counts), lambda: render_heatmap_png(t_name, counts))
+
+
+# ================================
+# 細かいヒートマップ（シュート位置の密度・マスごとの成功率）
+# ================================
+# 図の内容はマス目の件数（DensityGrid.key）と表示の種類だけで決まるので、それをキーに PNG をキャッシュする。
+DENSITY_MODES = ("密度", "成功率")
+
+
+def draw_density(ax, t_name, grid, mode="密度"):
+    from matplotlib import colormaps
+    draw_court_base(ax)
+    if mode == "成功率":
+        img = grid.rate(); cmap = colormaps["RdYlGn"].with_extremes(bad=(0, 0, 0, 0)); vmin, vmax = 0.0, 1.0
+    else:
+        d = grid.density(); img = np.ma.masked_less(d, 1e-3 * max(float(d.max()), 1e-12))
+        cmap = (colormaps["Blues"] if t_name == "味方" else colormaps["Reds"]).with_extremes(bad=(0, 0, 0, 0)); vmin, vmax = 0.0, max(float(d.max()), 1e-12)
+    im = ax.imshow(img, extent=grid.extent, origin="lower", cmap=cmap, vmin=vmin, vmax=vmax, interpolation="bilinear", alpha=0.85, zorder=1)
+    for zid in HEAT_ZONES:
+        o = engine.get_outline(zid); ax.plot(o[:,0], o[:,1], color="gray", linewidth=0.6, linestyle=":", zorder=2)
+    return im
+
+
+def render_density_png(t_name, grid, mode):
+    # 文字は日本語フォントのない環境でも出るよう ASCII だけにする
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import PercentFormatter
+    fig = Figure(figsize=(5, 4)); ax = fig.subplots(); im = draw_density(ax, t_name, grid, mode)
+    if mode == "成功率": fig.colorbar(im, ax=ax, fraction=0.03, pad=0.02, format=PercentFormatter(1.0, decimals=0))
+    ax.set_title(f"n = {grid.total}", fontsize=9)
+    return fig_to_png(fig, bbox_inches="tight", dpi=200)
+
+
+density_cache = ImageCache(maxsize=64)
+
+
+def density_png(t_name, grid, mode="密度"):
+    return density_cache.get_or_render((t_name, mode, grid.key()), lambda: render_density_png(t_name, grid, mode))
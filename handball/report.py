@@ -0,0 +1,144 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from handball.stats import STAT_ITEMS, StatsStore, format_stat, match_summary
+
+# ================================
+# 試合レポートの一括出力（python -m handball report）
+# ================================
+# 1 試合 = 1 ファイル（PNG か PDF）。スコアボード・STAT_ITEMS・ヒートマップ 2 面・選手/GK の成績表を 1 枚に描く。
+# 試合ごとにプロセスプールへ投げ、描き終わったものから順にワーカーがそのままファイルへ書き出す。
+# コートの幾何データ（handball.court）はワーカーの初期化時に一度だけ作り、以降の試合で使い回す。
+REPORT_FORMATS = ("png", "pdf")
+PAGE_SIZE = (8.27, 11.69)  # A4 縦（インチ）
+# 日本語を表示できるフォントを前から順に探す（見つからなければ matplotlib の既定フォント）
+JP_FONTS = ("Noto Sans CJK JP", "Noto Sans JP", "IPAexGothic", "IPAGothic", "Hiragino Sans", "Yu Gothic", "Meiryo", "TakaoGothic")
+TEAM_COLORS = {"味方": "#1e3a8a", "相手": "#991b1b"}
+PLAYER_ITEMS = [(sl, sk) for sl, sk in STAT_ITEMS if "セーブ率" not in sl]
+GK_ITEMS = [(sl, sk) for sl, sk in STAT_ITEMS if "セーブ率" in sl]
+# 成績表の見出し（列幅に収まる短い表記）
+SHORT_LABELS = {"攻撃成功率": "攻撃%", "シュート成功率": "シュート%", "FB成功率": "FB%", "FBシュート成功率": "FBシュート%", "7m回数": "7m",
+                "7mシュート成功率": "7m%", "TF回数": "TF", "RTF回数": "RTF", "シュートセーブ率": "セーブ%", "FBセーブ率": "FBセーブ%", "7mセーブ率": "7mセーブ%"}
+
+
+def report_filename(label, fmt):
+    # "2026-04-01 | 試合 (vs 北高)" -> "2026-04-01_試合_vs_北高.png"
+    stem = re.sub(r"[\s|/\\:*?\"<>()]+", "_", label).strip("_") or "match"
+    return f"{stem}.{fmt}"
+
+
+def find_fonts(font=None):
+    from matplotlib import font_manager
+    if font: return [font]
+    installed = {f.name for f in font_manager.fontManager.ttflist}
+    return [f for f in JP_FONTS if f in installed]
+
+
+def init_worker(font=None):
+    # ワーカープロセスごとに一度だけ呼ばれる（描画モジュールとコートの幾何データをここで読み込む）
+    import warnings
+    import matplotlib
+    import handball.render  # noqa: F401
+    fonts = find_fonts(font)
+    # 日本語フォントがない環境では文字が豆腐になるだけなので、文字ごとの警告は出さない（CLI が一度だけ知らせる）
+    if not fonts: warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    matplotlib.rcParams["font.family"] = ["sans-serif"]
+    matplotlib.rcParams["font.sans-serif"] = fonts + list(matplotlib.rcParams["font.sans-serif"])
+
+
+def _table(ax, rows, cols, header_color):
+    ax.axis("off")
+    if not rows:
+        ax.text(0.5, 0.5, "記録なし", ha="center", va="center", color="#64748b"); return
+    tb = ax.table(cellText=rows, colLabels=cols, loc="upper center", cellLoc="center")
+    tb.auto_set_font_size(False); tb.set_fontsize(7); tb.scale(1, 1.15)
+    for (r, _), cell in tb.get_celld().items():
+        cell.set_edgecolor("#e2e8f0")
+        if r == 0: cell.set_facecolor(header_color); cell.get_text().set_color("white"); cell.get_text().set_fontsize(6)
+
+
+def draw_report(fig, label, records):
+    from handball.render import draw_heatmap, heatmap_counts
+    s = match_summary(records, players=True); store = StatsStore(records)
+    a, o = s["teams"]["味方"], s["teams"]["相手"]
+    gs = fig.add_gridspec(5, 2, height_ratios=[0.7, 2.2, 2.0, 2.4, 1.0], hspace=0.35, wspace=0.08, left=0.05, right=0.95, top=0.95, bottom=0.03)
+
+    # スコアボード
+    ax = fig.add_subplot(gs[0, :]); ax.axis("off")
+    ax.text(0.5, 1.0, label, ha="center", va="top", fontsize=10, color="#64748b")
+    ax.text(0.5, 0.45, f"{a['goals']}  -  {o['goals']}", ha="center", va="center", fontsize=26, fontweight="bold")
+    ax.text(0.28, 0.45, a["name"], ha="right", va="center", fontsize=14, fontweight="bold", color=TEAM_COLORS["味方"])
+    ax.text(0.72, 0.45, o["name"], ha="left", va="center", fontsize=14, fontweight="bold", color=TEAM_COLORS["相手"])
+    ax.text(0.5, 0.0, f"前半 {a['goals_by_period']['前半']} - {o['goals_by_period']['前半']}    後半 {a['goals_by_period']['後半']} - {o['goals_by_period']['後半']}    ({s['events']} 件)", ha="center", va="bottom", fontsize=9, color="#64748b")
+
+    # STAT_ITEMS（値の大きい側を薄く色付け。アプリのスコアボードと同じ規則）
+    ax = fig.add_subplot(gs[1, :]); ax.axis("off")
+    rows = [[format_stat(sl, sk, a["stats"][sk]), sl, format_stat(sl, sk, o["stats"][sk])] for sl, sk in STAT_ITEMS]
+    tb = ax.table(cellText=rows, colLabels=[a["name"], "", o["name"]], loc="center", cellLoc="center", colWidths=[0.25, 0.3, 0.25])
+    tb.auto_set_font_size(False); tb.set_fontsize(8)
+    for (r, c), cell in tb.get_celld().items():
+        cell.set_edgecolor("#e2e8f0")
+        if r == 0: cell.set_facecolor(TEAM_COLORS["味方"] if c == 0 else TEAM_COLORS["相手"] if c == 2 else "white"); cell.get_text().set_color("white"); continue
+        av, ov = a["stats"][STAT_ITEMS[r - 1][1]], o["stats"][STAT_ITEMS[r - 1][1]]
+        if c == 0 and av > ov: cell.set_facecolor((30/255, 58/255, 138/255, 0.08))
+        if c == 2 and ov > av: cell.set_facecolor((153/255, 27/255, 27/255, 0.08))
+
+    # ヒートマップ 2 面
+    for i, t in enumerate(("味方", "相手")):
+        ax = fig.add_subplot(gs[2, i]); draw_heatmap(ax, t, heatmap_counts(store, t))
+        ax.set_title(f"{s['teams'][t]['name']} シュート位置", fontsize=9)
+
+    # 選手・GK の成績表
+    for i, t in enumerate(("味方", "相手")):
+        ps = [p for p in s["players"] if p["team"] == t]
+        _table(fig.add_subplot(gs[3, i]), [[p["No."]] + [format_stat(sl, sk, p["stats"][sk]) for sl, sk in PLAYER_ITEMS] for p in ps],
+               ["No."] + [SHORT_LABELS[sl] for sl, _ in PLAYER_ITEMS], TEAM_COLORS[t])
+        gks = [g for g in s["goalkeepers"] if g["team"] == t]
+        _table(fig.add_subplot(gs[4, i]), [[g["No."]] + [format_stat(sl, sk, g["stats"][sk]) for sl, sk in GK_ITEMS] for g in gks],
+               ["GK"] + [SHORT_LABELS[sl] for sl, _ in GK_ITEMS], TEAM_COLORS[t])
+
+
+def render_report(label, records, fmt="png", dpi=150):
+    import io
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=PAGE_SIZE); buf = io.BytesIO()
+    try:
+        draw_report(fig, label, records)
+        fig.savefig(buf, format=fmt, dpi=dpi)
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def report_paths(labels, out_dir, fmt):
+    # ファイル名が重なる試合には _2, _3 … を付ける
+    out = {}; used = set()
+    for label in labels:
+        name = report_filename(label, fmt); stem, ext = name.rsplit(".", 1); i = 1
+        while name in used: i += 1; name = f"{stem}_{i}.{ext}"
+        used.add(name); out[label] = Path(out_dir) / name
+    return out
+
+
+def write_report(label, records, path, fmt="png", dpi=150):
+    # ワーカーで実行される。書き出したパス・件数・所要時間を返す
+    t0 = time.perf_counter(); path = Path(path)
+    data = render_report(label, records, fmt, dpi)
+    tmp = path.with_name(path.name + ".tmp"); tmp.write_bytes(data); os.replace(tmp, path)
+    return str(path), len(records), time.perf_counter() - t0
+
+
+def run_batch(matches, out_dir, fmt="png", jobs=None, dpi=150, font=None):
+    # matches: 試合ラベル -> 記録のリスト。終わった順に (ラベル, パス, 件数, 秒) を返すジェネレータ
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    paths = report_paths(matches, out_dir, fmt)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(matches)))
+    if jobs == 1:
+        init_worker(font)
+        for label, recs in matches.items(): yield (label, *write_report(label, recs, paths[label], fmt, dpi))
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(font,)) as pool:
+        futs = {pool.submit(write_report, label, recs, paths[label], fmt, dpi): label for label, recs in matches.items()}
+        for f in as_completed(futs): yield (futs[f], *f.result())
@@ -0,0 +1,140 @@
+from handball.schema import is_missing
+
+# ================================
+# 選手名簿（チームごとに背番号で引ける索引）
+# ================================
+# 選手は背番号 -> dict で持ち、変更のたびに version を進める。背番号順の一覧・GK の番号・
+# 表示用の DataFrame は version ごとに一度だけ作り、再実行のたびには作り直さない。
+# 表（st.data_editor）の編集は差分（edited_rows / added_rows / deleted_rows）だけを反映する。
+# 背番号はチーム内で重ならない。登録済みの番号での登録・番号の変更は受け付けない（別の選手を上書きしない）。
+PLAYER_COLUMNS = ("No.", "名前", "Pos", "🟨 警告", "✌退場", "🟥 失格")
+PENALTY_COLUMNS = ("🟨 警告", "✌退場", "🟥 失格")
+
+
+def _no(v):
+    # 数字の背番号は "07" も "7" にそろえる
+    if is_missing(v): return None
+    v = str(int(v)) if isinstance(v, float) and v.is_integer() else str(v).strip()
+    return str(int(v)) if v.isdigit() else (v or None)
+
+
+def _no_key(no):
+    return int(no) if no.isdigit() else 999
+
+
+class Roster:
+    def __init__(self, players=(), version=0):
+        self._by_no = {}
+        self.version = version
+        self._cache = {}
+        for p in players: self._merge(p)
+
+    def _record(self, p):
+        no = _no(p.get("No."))
+        if no is None: return None
+        rec = {c: p.get(c, "") for c in PLAYER_COLUMNS}; rec["No."] = no
+        return rec
+
+    def _put(self, p):
+        # 登録済みの背番号なら何もせず None
+        rec = self._record(p)
+        if rec is None or rec["No."] in self._by_no: return None
+        self._by_no[rec["No."]] = rec
+        return rec
+
+    def _merge(self, p):
+        # 以前の形式の名簿に同じ背番号が重なっていたら、最初の選手に警告・退場・失格の記録を合わせる
+        rec = self._record(p)
+        if rec is None: return
+        old = self._by_no.setdefault(rec["No."], rec)
+        if old is rec: return
+        for c in PENALTY_COLUMNS:
+            old[c] = ", ".join(v for v in (old.get(c), rec.get(c)) if v and not is_missing(v))
+
+    def _changed(self):
+        self.version += 1; self._cache.clear()
+
+    def _cached(self, name, build):
+        if name not in self._cache: self._cache[name] = build()
+        return self._cache[name]
+
+    # --- 参照（すべて O(1) か version ごとのキャッシュ） ---
+    def __len__(self):
+        return len(self._by_no)
+
+    def __bool__(self):
+        return bool(self._by_no)
+
+    def __contains__(self, no):
+        return _no(no) in self._by_no
+
+    def __iter__(self):
+        return iter(self.sorted())
+
+    def get(self, no, default=None):
+        return self._by_no.get(_no(no), default)
+
+    def is_gk(self, no):
+        p = self.get(no)
+        return p is not None and p.get("Pos") == "GK"
+
+    def sorted(self):
+        # 背番号順（数字でない番号は後ろ、同じ順位は登録順）
+        return self._cached("sorted", lambda: sorted(self._by_no.values(), key=lambda p: _no_key(p["No."])))
+
+    def numbers(self):
+        return self._cached("numbers", lambda: [p["No."] for p in self.sorted()])
+
+    def gk_numbers(self):
+        # 登録順
+        return self._cached("gk", lambda: [no for no, p in self._by_no.items() if p.get("Pos") == "GK"])
+
+    def labels(self):
+        return self._cached("labels", lambda: [f"No.{p['No.']} {p['名前']}" for p in self.sorted()])
+
+    def records(self):
+        # 共有・ジャーナル用のコピー（背番号順）
+        return self._cached("records", lambda: [dict(p) for p in self.sorted()])
+
+    def frame(self):
+        # st.data_editor に渡す表（version が変わったときだけ作る）
+        def build():
+            import pandas as pd
+            return pd.DataFrame(self.sorted(), columns=list(PLAYER_COLUMNS))
+        return self._cached("frame", build)
+
+    # --- 変更 ---
+    def add(self, player):
+        # 登録した選手を返す。背番号がないか登録済みなら None
+        rec = self._put(player)
+        if rec is not None: self._changed()
+        return rec
+
+    def add_penalty(self, no, kind, label):
+        p = self.get(no)
+        if p is None: return False
+        p[kind] = f"{p.get(kind) or ''}, {label}".strip(", "); self._changed()
+        return True
+
+    def apply_edits(self, delta):
+        # data_editor の差分を反映する。行番号はこの version の sorted() の位置。
+        # 受け付けなかった背番号（登録済みの番号への変更・追加、空にした番号、番号のない追加行は ""）の並びを返す。
+        # version は何か反映したときだけ進める
+        base = self.sorted(); rejected = []; changed = False
+        for i, changes in delta.get("edited_rows", {}).items():
+            p = base[int(i)]; old = p["No."]
+            cols = {c: v for c, v in changes.items() if c in PLAYER_COLUMNS and c != "No."}
+            if cols: p.update(cols); changed = True
+            if "No." not in changes: continue
+            new = _no(changes["No."])
+            if new is None or (new != old and new in self._by_no): rejected.append(changes["No."]); continue
+            if new != old and self._by_no.get(old) is p: del self._by_no[old]; p["No."] = new; self._by_no[new] = p; changed = True
+        for i in delta.get("deleted_rows", ()):
+            no = base[int(i)]["No."]
+            if self._by_no.get(no) is base[int(i)]: del self._by_no[no]; changed = True
+        for r in delta.get("added_rows", ()):
+            r = {c: ("" if is_missing(v) else v) for c, v in r.items()}
+            if self._put(r) is not None: changed = True
+            else: rejected.append(r.get("No.") if _no(r.get("No.")) is not None else "")
+        if changed: self._changed()
+        return rejected
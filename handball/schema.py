@@ -0,0 +1,63 @@
+import math
+
+# ================================
+# イベントのスキーマ（依存ライブラリなし）
+# ================================
+# 「記録を確定」で書き込む 1 件 = 1 行の列と、値の種類が決まっている列の候補。
+# アプリ・CLI・シート同期・過去試合の索引はすべてここを参照する。
+LOG_COLUMNS = ("試合名", "日付", "相手校", "id", "時間", "チーム", "No.", "位置", "結果", "状況", "ピリオド", "vs_gk", "X", "Y")
+# コートをクリックした位置（m, コート座標）。座標なしで記録した行・以前の記録は空
+COORD_COLUMNS = ("X", "Y")
+EXPORT_COLUMNS = tuple(c for c in LOG_COLUMNS if c != "id")
+
+TEAMS = ("味方", "相手")
+RESULTS = ("G", "O", "Save", "TF", "RTF")
+SITUATIONS = ("Set", "FB", "7m")
+ZONES = tuple(str(i) for i in range(1, 10))
+PERIODS = ("前半", "後半")
+FIXED_CATEGORIES = {"チーム": TEAMS, "結果": RESULTS, "状況": SITUATIONS, "位置": ZONES, "ピリオド": PERIODS}
+
+# 退場（✌退場・🟥 失格）で数的不利になる時間（秒）
+SUSPENSION_SEC = 120
+
+# 試合を見分ける列（この 3 つが同じ行を 1 試合として扱う）
+MATCH_KEYS = ("日付", "試合名", "相手校")
+
+
+def is_missing(v):
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+def clean_cell(v):
+    # シート・CSV の値を文字列にそろえる（数値として読まれた No. や位置も "7" / "9" に戻す）
+    if is_missing(v): return None
+    if isinstance(v, float) and v.is_integer(): return str(int(v))
+    return str(v) if v != "" else None
+
+
+def parse_clock(v):
+    # "MM:SS"（時間の列）を試合開始からの秒数に。読めなければ None
+    if is_missing(v): return None
+    try:
+        m, sec = str(v).split(":")
+        return int(m) * 60 + int(sec)
+    except ValueError:
+        return None
+
+
+def parse_coord(v):
+    # X / Y の値を float に。空・読めない値は None
+    if is_missing(v) or v == "": return None
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+
+def match_label(date, title, opp):
+    return f"{date} | {title} (vs {opp if opp is not None else '不明'})"
+
+
+def record_label(r):
+    return match_label(*(r.get(k) for k in MATCH_KEYS))
@@ -0,0 +1,160 @@
+import copy
+import json
+import threading
+import time
+from pathlib import Path
+from handball.journal import Journal, journal_path
+
+# ================================
+# 複数人で記録する試合（プロセス内で共有するイベントストア）
+# ================================
+# 同じ試合（ジャーナル ID）を開いたセッションは同じ SharedMatch を使う。
+# 記録の id はここで一括して振る（セッションごとの連番だと sync_key が重なるため）。
+# 名簿・退場・時計などの値は後勝ちで、値ごとの版番号を見て他のセッションの変更を取り込む。
+# 書き込みはすべてロックの中でジャーナルに追記するので、ファイル上の順序 = id の順序になる。
+# 見ているセッションがいなくなって IDLE_CLOSE_SEC たった試合は、次に試合を開くときにジャーナルを閉じて手放す。
+VIEWER_TTL_SEC = 30.0
+IDLE_CLOSE_SEC = 600.0
+
+
+class SharedMatch:
+    def __init__(self, journal):
+        self.journal = journal
+        self.logs = journal.logs
+        self.seq = 0                      # 何かが変わるたびに増える（表示側の再実行の判定用）
+        self.versions = {k: 1 for k in journal.values}
+        self._next_id = int(self.logs.codes("id").max()) + 1 if len(self.logs) else 0
+        self._viewers = {}
+        self._opened = time.monotonic()
+        self._lock = threading.RLock()
+        self.closed = False
+
+    @property
+    def id(self):
+        return self.journal.id
+
+    def append(self, record):
+        # id を振って追記し、その id を返す。閉じた後は追記せず None
+        with self._lock:
+            if self.closed: return None
+            rec = dict(record, id=self._next_id)
+            self.journal.event(rec); self.logs.append(rec)
+            self._next_id += 1; self.seq += 1
+            return rec["id"]
+
+    def put(self, kind, value):
+        # 値が変わったときだけ書き、新しい版番号を返す（変わらなければ None）
+        with self._lock:
+            if self.closed or not self.journal.put(kind, value): return None
+            v = self.versions[kind] = self.versions.get(kind, 0) + 1; self.seq += 1
+            return v
+
+    def changes(self, seen):
+        # seen（kind -> 取り込み済みの版）より新しい値を {kind: (版, 値のコピー)} で返す
+        with self._lock:
+            return {k: (v, copy.deepcopy(self.journal.values[k])) for k, v in self.versions.items() if v > seen.get(k, 0)}
+
+    def touch(self, viewer):
+        self._viewers[viewer] = time.monotonic()
+
+    def viewers(self, ttl=VIEWER_TTL_SEC):
+        now = time.monotonic()
+        return sum(1 for t in list(self._viewers.values()) if now - t < ttl)
+
+    def idle(self, ttl=IDLE_CLOSE_SEC):
+        # ttl の間、どのセッションも見ていない（開いた直後はまだ数えない）
+        return self.viewers(ttl) == 0 and time.monotonic() - self._opened >= ttl
+
+    def close(self):
+        with self._lock:
+            if self.closed: return
+            self.closed = True; self.journal.close()
+
+
+_matches = {}
+_matches_lock = threading.Lock()
+
+
+def get_shared_match(directory, jid):
+    # 同じ試合の SharedMatch は全セッションで共有する（初めて開くときにジャーナルを再生する）
+    path = journal_path(directory, jid)
+    with _matches_lock:
+        close_idle_matches()
+        m = _matches.get(str(path))
+        if m is None or m.closed: m = _matches[str(path)] = SharedMatch(Journal(path))
+        return m
+
+
+def close_idle_matches(ttl=IDLE_CLOSE_SEC):
+    # 誰も見ていない試合のジャーナルを閉じて手放す（_matches_lock を持って呼ぶ）
+    for k, m in list(_matches.items()):
+        if m.closed or m.idle(ttl): m.close(); del _matches[k]
+
+
+def open_match_ids(directory):
+    # このプロセスで開いている試合の ID（ジャーナルの整理で消さないもの）
+    with _matches_lock:
+        return {m.id for m in _matches.values() if not m.closed and m.journal.path.parent == Path(directory)}
+
+
+class MatchView:
+    # セッションごとの SharedMatch の見え方（どの版まで取り込んだか・自分が最後に見た値）
+    def __init__(self, match, viewer):
+        self.match = match
+        self.viewer = viewer
+        self.seq = -1
+        self.seen = {}
+        self._known = {}
+        self._tokens = {}
+
+    @property
+    def id(self):
+        return self.match.id
+
+    @property
+    def closed(self):
+        return self.match.closed
+
+    def pull(self):
+        # 前回から他のセッションが変えた値を {kind: 値} で返す
+        with self.match._lock:
+            self.seq = self.match.seq; changes = self.match.changes(self.seen)
+        for k, (v, value) in changes.items(): self.seen[k] = v; self._known[k] = _dump(value); self._tokens.pop(k, None)
+        self.touch()
+        return {k: value for k, (_, value) in changes.items()}
+
+    def push(self, kind, value, token=None):
+        # このセッションで値を変えたときだけ共有側に書く（変えていない値で他人の変更を上書きしない）
+        # token（名簿の version など）が前回と同じなら、値を比べるまでもなく変わっていない
+        if token is not None and self._tokens.get(kind) == token: return False
+        self._tokens[kind] = token
+        s = _dump(value)
+        if self._known.get(kind) == s: return False
+        self._known[kind] = s
+        with self.match._lock:
+            caught_up = self.match.seq == self.seq
+            v = self.match.put(kind, value)
+            if v is not None: self.seen[kind] = v; self._advance(caught_up)
+        return v is not None
+
+    def append(self, record):
+        # 追記した記録の id を返す。試合が閉じられていたら None（開き直してから追記する）
+        with self.match._lock:
+            caught_up = self.match.seq == self.seq
+            rid = self.match.append(record)
+            if rid is not None: self._advance(caught_up)
+        return rid
+
+    def _advance(self, caught_up):
+        # 自分の書き込みだけで版が進んだなら、取り込み済みとして扱う（自分の変更で再実行しない）
+        if caught_up: self.seq = self.match.seq
+
+    def touch(self):
+        self.match.touch(self.viewer)
+
+    def stale(self):
+        return self.match.seq != self.seq
+
+
+def _dump(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
@@ -0,0 +1,127 @@
+import time
+import pandas as pd
+from handball.schema import EXPORT_COLUMNS
+
+# ================================
+# スプレッドシートへの追記送信
+# ================================
+# 未送信分（last_sent_idx 以降）だけを行単位で追記する。シート全体の読み込みと書き戻しはしない。
+# 各行には sync_key を付け、再送時は既存の sync_key と突き合わせて重複を防ぐ。
+# 試合 ID（ジャーナル ID）があれば「試合ID|id」、なければ「日付|試合名|id」。id は試合ごとに 0 から振るので、
+# リセット後の次の試合で日付・試合名が同じでも、試合 ID があればキーは重ならない。
+SYNC_KEY = "sync_key"
+SHEET_COLUMNS = EXPORT_COLUMNS + (SYNC_KEY,)
+BATCH_ROWS = 200
+RETRIES = 3
+BACKOFF_SEC = 1.0
+
+
+class SheetSyncError(Exception):
+    # sent_idx: 送信が確定したところまでのログ位置（次回はここから送る）
+    def __init__(self, sent_idx, cause):
+        super().__init__(f"{cause}")
+        self.sent_idx = sent_idx
+        self.cause = cause
+
+
+def open_worksheet(conn, worksheet=None):
+    # GSheetsConnection（サービスアカウント接続）から gspread の Worksheet を取り出す
+    select = getattr(getattr(conn, "client", None), "_select_worksheet", None)
+    if select is None: raise SheetSyncError(0, "この接続は追記送信に対応していません（サービスアカウント接続が必要です）")
+    return select(worksheet=worksheet)
+
+
+def sheet_frame(log, start, stop=None, match_id=None):
+    # 送信用の DataFrame（id の代わりに sync_key 列を持つ）
+    if stop is None: stop = len(log)  # id の列と行数をそろえる（読み始めの件数で切る）
+    df = log.to_frame(start=start, stop=stop, columns=EXPORT_COLUMNS, categorical=False)
+    ids = log.codes("id")[start:stop]
+    prefix = f"{match_id}|" if match_id is not None else df["日付"].astype(str) + "|" + df["試合名"].astype(str) + "|"
+    df[SYNC_KEY] = prefix + pd.Series(ids, index=df.index).astype(str)
+    return df
+
+
+def ensure_header(ws):
+    header = ws.row_values(1)
+    if not header:
+        ws.append_rows([list(SHEET_COLUMNS)], value_input_option="RAW")
+        return list(SHEET_COLUMNS)
+    for c in SHEET_COLUMNS:
+        if c not in header:
+            header.append(c); ws.update_cell(1, len(header), c)
+    return header
+
+
+def append_batch(ws, rows, keys, key_col, verify, retries, backoff, sleep):
+    for attempt in range(retries + 1):
+        try:
+            if verify:
+                # 直前の送信が途中で失敗した可能性がある: 既にシートにある行は送らない
+                existing = set(ws.col_values(key_col))
+                rows = [r for r, k in zip(rows, keys) if k not in existing]; keys = [k for k in keys if k not in existing]
+            if rows: ws.append_rows(rows, value_input_option="USER_ENTERED")
+            return
+        except Exception:
+            if attempt == retries: raise
+            verify = True; sleep(backoff * 2**attempt)
+
+
+def append_logs(ws, log, start, verify=False, batch_rows=BATCH_ROWS, retries=RETRIES, backoff=BACKOFF_SEC, sleep=time.sleep, match_id=None):
+    # log[start:] を batch_rows 行ずつ追記し、送信済みになったログ位置を返す。
+    # verify=True は前回の送信が失敗していたとき（最初のバッチから重複確認する）
+    n = len(log); sent = start
+    try:
+        header = ensure_header(ws); key_col = header.index(SYNC_KEY) + 1
+        for a in range(start, n, batch_rows):
+            b = min(a + batch_rows, n)
+            df = sheet_frame(log, a, b, match_id).reindex(columns=header).fillna("")
+            append_batch(ws, df.values.tolist(), df[SYNC_KEY].tolist(), key_col, verify, retries, backoff, sleep)
+            sent = b
+    except Exception as e:
+        raise SheetSyncError(sent, e) from e
+    return sent
+
+
+class MemoryWorksheet:
+    # gspread.Worksheet のうち追記送信で使う部分だけを持つメモリ上のシート（オフライン確認・テスト用）
+    def __init__(self, rows=None):
+        self.rows = [list(r) for r in (rows or [])]
+
+    def row_values(self, row):
+        return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def col_values(self, col):
+        return [r[col - 1] if len(r) >= col else "" for r in self.rows]
+
+    def get_values(self, range_name):
+        # "A{行}:{列}" 形式（指定行から最終行まで）のみ対応
+        start = int("".join(ch for ch in range_name.split(":")[0] if ch.isdigit()))
+        return [list(r) for r in self.rows[start - 1:]]
+
+    def update_cell(self, row, col, value):
+        while len(self.rows) < row: self.rows.append([])
+        r = self.rows[row - 1]
+        r.extend([""] * (col - len(r))); r[col - 1] = value
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self.rows.extend([list(map(str, v)) for v in values])
+
+    def to_frame(self):
+        return pd.DataFrame(self.rows[1:], columns=self.rows[0]) if self.rows else pd.DataFrame()
+
+
+class MemorySheetConnection:
+    # GSheetsConnection と同じ read / update / client._select_worksheet を持つ代替
+    def __init__(self, worksheet=None):
+        self.worksheet = worksheet or MemoryWorksheet()
+        self.client = self
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        return self.worksheet
+
+    def read(self, ttl=None, **kwargs):
+        return self.worksheet.to_frame()
+
+    def update(self, data=None, **kwargs):
+        self.worksheet.rows = [list(data.columns)] + data.astype(str).values.tolist()
+        return data
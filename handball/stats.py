@@ -0,0 +1,149 @@
+from collections import Counter, defaultdict
+from handball.schema import TEAMS
+
+# ================================
+# 集計ストア（ログ追加ごとにカウンタを O(1) で更新）
+# ================================
+# STAT_ITEMS の各値はここに積み上げたカウンタから読み出す。
+# 判定式（7m 扱い・シュート扱い）は元の get_stats_logic と同じ比較をそのまま使う。
+STAT_ITEMS = [
+    ("攻撃成功率", "atk_suc"),
+    ("シュート成功率", "sht_suc"),
+    ("FB成功率", "fb_suc"),
+    ("FBシュート成功率", "fb_sht_suc"),
+    ("7m回数", "m7_cnt"),
+    ("7mシュート成功率", "m7_sht_suc"),
+    ("TF回数", "tf"),
+    ("RTF回数", "rtf"),
+    ("シュートセーブ率", "sht_sav"),
+    ("FBセーブ率", "fb_sav"),
+    ("7mセーブ率", "m7_sav")
+]
+
+SHOT_RESULTS = ("G", "O", "Save")
+FIELD_CATS = ("Set", "FB")
+
+
+def _category(l):
+    # "7m": 7m スロー / "FB": 速攻 / "Set": それ以外のフィールド攻撃
+    if l["位置"] == "9" or l["状況"] == "7m": return "7m"
+    return "FB" if l["状況"] == "FB" else "Set"
+
+
+def _count(c, cats, results=None):
+    return sum(v for (cat, res), v in c.items() if cat in cats and (results is None or res in results))
+
+
+def _rate(num, den): return round((num/den)*100, 1) if den > 0 else 0.0
+
+
+def format_stat(label, key, v):
+    # 回数の項目は整数、それ以外は % 表示
+    return f"{int(v)}" if "回数" in label or "tf" in key or "rtf" in key else f"{v:.1f}%"
+
+
+class StatsStore:
+    def __init__(self, logs=()):
+        self.n = 0
+        self.team = defaultdict(Counter)      # チーム -> (区分, 結果)
+        self.player = defaultdict(Counter)    # (チーム, No.) -> (区分, 結果)
+        self.gk = defaultdict(Counter)        # (シュートしたチーム, vs_gk) -> (区分, 結果)
+        self.zone = defaultdict(Counter)      # (チーム, 位置) -> 結果
+        self.period = defaultdict(Counter)    # (チーム, ピリオド) -> 結果
+        self.extend(logs)
+
+    def add(self, l):
+        key = (_category(l), l["結果"]); t = l["チーム"]
+        self.team[t][key] += 1
+        self.player[(t, l["No."])][key] += 1
+        self.gk[(t, l.get("vs_gk"))][key] += 1
+        self.zone[(t, l["位置"])][l["結果"]] += 1
+        self.period[(t, l["ピリオド"])][l["結果"]] += 1
+        self.n += 1
+
+    def extend(self, logs):
+        for l in logs: self.add(l)
+
+    def sync(self, logs):
+        # ログ末尾の未集計分だけ追加する。リセット等でログが縮んだら作り直す
+        if len(logs) < self.n: self.__init__()
+        self.extend(logs[self.n:])
+        return self
+
+    def _against(self, team_name, target_gk=None, is_gk_target=False):
+        c = Counter()
+        if is_gk_target:
+            for (t, g), v in self.gk.items():
+                if t != team_name and g == target_gk: c.update(v)
+        else:
+            for t, v in self.team.items():
+                if t != team_name: c.update(v)
+        return c
+
+    def goals(self, team_name, period=None):
+        if period is not None: return self.period.get((team_name, period), Counter())["G"]
+        return _count(self.team.get(team_name, Counter()), ("Set", "FB", "7m"), ("G",))
+
+    def zone_counts(self, team_name, zid):
+        # (記録数, シュート数, ゴール数)
+        c = self.zone.get((team_name, zid), Counter())
+        return sum(c.values()), sum(c[r] for r in SHOT_RESULTS), c["G"]
+
+    def non_7m_zone_total(self, team_name):
+        # ヒートマップの分母（位置が 7m 以外の記録数）
+        return sum(self.team.get(team_name, Counter()).values()) - sum(self.zone.get((team_name, "9"), Counter()).values())
+
+    def stats(self, team_name, target_no=None, is_gk_target=False):
+        if target_no and not is_gk_target: off = self.player.get((team_name, target_no), Counter())
+        else: off = self.team.get(team_name, Counter())
+        dfn = self._against(team_name, target_no, is_gk_target)
+        return _stats_from_counters(off, dfn)
+
+
+def _stats_from_counters(off, dfn):
+    def sav(c, cats):
+        return _rate(_count(c, cats, ("Save",)), _count(c, cats, SHOT_RESULTS))
+    return {
+        "atk_suc": _rate(_count(off, FIELD_CATS, SHOT_RESULTS), _count(off, FIELD_CATS)),
+        "sht_suc": _rate(_count(off, FIELD_CATS, ("G",)), _count(off, FIELD_CATS, SHOT_RESULTS)),
+        "fb_suc": _rate(_count(off, ("FB",), SHOT_RESULTS), _count(off, ("FB",))),
+        "fb_sht_suc": _rate(_count(off, ("FB",), ("G",)), _count(off, ("FB",), SHOT_RESULTS)),
+        "m7_cnt": float(_count(off, ("7m",))),
+        "m7_sht_suc": _rate(_count(off, ("7m",), ("G",)), _count(off, ("7m",), SHOT_RESULTS)),
+        "tf": float(_count(off, ("Set", "FB", "7m"), ("TF",))),
+        "rtf": float(_count(off, ("Set", "FB", "7m"), ("RTF",))),
+        "sht_sav": sav(dfn, FIELD_CATS), "fb_sav": sav(dfn, ("FB",)), "m7_sav": sav(dfn, ("7m",)),
+    }
+
+
+def get_stats_logic(logs_to_calc, team_name, all_logs, target_no=None, is_gk_target=False):
+    # 従来の関数と同じ呼び出し方ができる版（都度ストアを作るので繰り返し呼ぶ箇所では StatsStore を使う）
+    off_store = StatsStore(logs_to_calc)
+    def_store = off_store if all_logs is logs_to_calc else StatsStore(all_logs)
+    if target_no and not is_gk_target: off = off_store.player.get((team_name, target_no), Counter())
+    else: off = off_store.team.get(team_name, Counter())
+    return _stats_from_counters(off, def_store._against(team_name, target_no, is_gk_target))
+
+
+# ================================
+# 試合ごとの集計（CLI・レポート共通）
+# ================================
+def _player_key(team, no):
+    # チーム順 → 背番号の数値順（数字でない番号は後ろ）
+    return (TEAMS.index(team) if team in TEAMS else len(TEAMS), int(no) if no.isdigit() else 999, no)
+
+
+def match_summary(records, players=False):
+    store = StatsStore(records)
+    opp = next((r["相手校"] for r in records if r.get("相手校")), None)
+    out = {"events": len(records), "teams": {}}
+    for t in TEAMS:
+        out["teams"][t] = {"name": opp if t == "相手" and opp else t, "goals": store.goals(t),
+                          "goals_by_period": {p: store.goals(t, p) for p in ("前半", "後半")}, "stats": store.stats(t)}
+    if players:
+        # GK は vs_gk に名前が出てくる番号（相手のシュートに対するセーブ率を出す）
+        nos = sorted({k for k in store.player if k[1] is not None}, key=lambda k: _player_key(*k))
+        gks = sorted({(o, g) for (t, g) in store.gk if g not in (None, "未登録") for o in TEAMS if o != t}, key=lambda k: _player_key(*k))
+        out["players"] = [{"team": t, "No.": no, "stats": store.stats(t, target_no=no)} for t, no in nos]
+        out["goalkeepers"] = [{"team": t, "No.": g, "stats": store.stats(t, target_no=g, is_gk_target=True)} for t, g in gks]
+    return out
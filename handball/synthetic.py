@@ -0,0 +1,65 @@
+import random
+from datetime import date, timedelta
+from handball.court import _ZONE_BBOX, _inside, ZONE_LABELS
+
+# ================================
+# 合成試合データ（ベンチマーク・動作確認用）
+# ================================
+# 「記録を確定」が書き込むのと同じ形（試合名・日付・相手校・id・時間・チーム・No.・位置・結果・状況・ピリオド・vs_gk・X・Y）の
+# ログを、seed ごとに再現可能な形で生成する。7m は位置 "9" のときだけ、FB/Set はそれ以外のとき。
+# シュート位置（X, Y）はゾーンの中から一様に選ぶ（座標用の乱数は試合ごとに別にし、他の列の値は座標なしのときと同じ）。
+RESULT_WEIGHTS = {"G": 45, "O": 20, "Save": 20, "TF": 12, "RTF": 3}
+ZONE_WEIGHTS = {"1": 7, "2": 12, "3": 16, "4": 12, "5": 7, "6": 13, "7": 15, "8": 13, "9": 5}
+FB_RATE = 0.15
+EVENTS_PER_MATCH = 100
+MATCH_SEC = 60 * 60
+OPPONENTS = ("北高", "南高", "東高", "西高", "中央高", "工業高", "商業高", "学園")
+
+
+def _roster(rng, n=14):
+    nos = rng.sample(range(1, 40), n)
+    return [str(x) for x in nos[:2]], [str(x) for x in nos[2:]]  # (GK, フィールド)
+
+
+def _shot_xy(rng, zone):
+    x0, y0, x1, y1 = _ZONE_BBOX[zone]
+    for _ in range(50):
+        x, y = round(rng.uniform(x0, x1), 2), round(rng.uniform(y0, y1), 2)
+        if _inside(zone, x, y): return x, y
+    return ZONE_LABELS[zone]
+
+
+def iter_match(rng, title, day, opp, n_events=EVENTS_PER_MATCH):
+    xy_rng = random.Random(f"{title}|{day}|{opp}")
+    ally_gk, ally_field = _roster(rng); opp_gk, opp_field = _roster(rng)
+    results, r_w = list(RESULT_WEIGHTS), list(RESULT_WEIGHTS.values())
+    zones, z_w = list(ZONE_WEIGHTS), list(ZONE_WEIGHTS.values())
+    times = sorted(rng.randrange(MATCH_SEC) for _ in range(n_events))
+    for i, t in enumerate(times):
+        team = "味方" if rng.random() < 0.5 else "相手"
+        zone = rng.choices(zones, z_w)[0]
+        sit = "7m" if zone == "9" else ("FB" if rng.random() < FB_RATE else "Set")
+        x, y = _shot_xy(xy_rng, zone)
+        shooters = ally_field if team == "味方" else opp_field
+        gks = opp_gk if team == "味方" else ally_gk
+        yield {
+            "試合名": title, "日付": str(day), "相手校": opp,
+            "id": i, "時間": f"{t // 60:02d}:{t % 60:02d}",
+            "チーム": team, "No.": rng.choice(shooters), "位置": zone,
+            "結果": rng.choices(results, r_w)[0], "状況": sit, "ピリオド": "前半" if t < MATCH_SEC // 2 else "後半",
+            "vs_gk": gks[0] if rng.random() < 0.85 else (gks[1] if rng.random() < 0.8 else "未登録"),
+            "X": x, "Y": y,
+        }
+
+
+def iter_logs(n_events, seed=0, events_per_match=EVENTS_PER_MATCH):
+    # n_events 件になるまで試合を続けて生成する（1 試合 events_per_match 件）
+    rng = random.Random(seed); day = date(2026, 4, 1); k = 0; left = n_events
+    while left > 0:
+        n = min(events_per_match, left)
+        yield from iter_match(rng, f"練習試合_{k:05d}", day + timedelta(days=k // 4), OPPONENTS[k % len(OPPONENTS)], n)
+        left -= n; k += 1
+
+
+def generate_logs(n_events, seed=0, events_per_match=EVENTS_PER_MATCH):
+    return list(iter_logs(n_events, seed, events_per_match))
@@ -0,0 +1,134 @@
+import numpy as np
+from collections import Counter
+from handball.schema import TEAMS, RESULTS, SITUATIONS, ZONES, SUSPENSION_SEC
+from handball.stats import _stats_from_counters
+
+# ================================
+# 試合時間の索引（時間帯ごとの集計を O(log n) で）
+# ================================
+# 記録を試合時間（秒）の順に並べ、(チーム, 区分, 結果) ごとの件数の累積和を持つ。
+# 時間帯 [t0, t1) の件数は二分探索で両端の位置を求め、累積和の差をとるだけで出る。
+# 区分は stats._category と同じ（位置 9 か状況 7m なら "7m"、状況 FB なら "FB"、それ以外 "Set"）。
+KEYS = tuple((t, c, r) for t in TEAMS for c in SITUATIONS for r in RESULTS)
+_N_CAT, _N_RES = len(SITUATIONS), len(RESULTS)
+_CAT_SET, _CAT_FB, _CAT_7M = (SITUATIONS.index(c) for c in ("Set", "FB", "7m"))
+_ZONE_7M = ZONES.index("9")
+BLOCK = 16_384
+
+
+def _key_codes(log, start, stop):
+    # 行ごとの KEYS の位置（チーム・結果が決まっていない行は -1）
+    team = log.codes("チーム")[start:stop].astype(np.int64); res = log.codes("結果")[start:stop].astype(np.int64)
+    sit = log.codes("状況")[start:stop]; pos = log.codes("位置")[start:stop]
+    cat = np.where((pos == _ZONE_7M) | (sit == _CAT_7M), _CAT_7M, np.where(sit == _CAT_FB, _CAT_FB, _CAT_SET))
+    ok = (team >= 0) & (team < len(TEAMS)) & (res >= 0) & (res < _N_RES)
+    return np.where(ok, (team * _N_CAT + cat) * _N_RES + res, -1)
+
+
+class Timeline:
+    def __init__(self, capacity=256):
+        self.n = 0                                    # 取り込み済みのログ行数
+        self.m = 0                                    # 索引に入っている記録数（時間の読めない行は除く）
+        self.t = np.empty(capacity)                   # 試合時間（昇順）
+        self.k = np.empty(capacity, dtype=np.int16)   # 各記録の KEYS の位置
+        self.prefix = np.zeros((capacity + 1, len(KEYS)), dtype=np.int32)  # prefix[i] = 先頭 i 件の件数
+
+    def sync(self, log):
+        # ログ末尾の未取り込み分を足す。時間が前後した記録が来たら並べ直す
+        # 件数は一度だけ読む（共有中の試合では別スレッドが追記していても、この呼び出しでは n 件目まで）
+        n = len(log)
+        if n < self.n or getattr(log, "uid", None) != getattr(self, "_uid", None): self.__init__(); self._uid = getattr(log, "uid", None)
+        if n == self.n: return self
+        secs = log.seconds()[self.n:n]; keys = _key_codes(log, self.n, n); self.n = n
+        ok = ~np.isnan(secs) & (keys >= 0); secs, keys = secs[ok], keys[ok]
+        if not len(secs): return self
+        in_order = (self.m == 0 or secs[0] >= self.t[self.m - 1]) and bool(np.all(secs[1:] >= secs[:-1]))
+        self._reserve(self.m + len(secs))
+        a, b = self.m, self.m + len(secs)
+        self.t[a:b] = secs; self.k[a:b] = keys; self.m = b
+        if in_order: self._accumulate(a)
+        else:
+            order = np.argsort(self.t[:b], kind="stable"); self.t[:b] = self.t[:b][order]; self.k[:b] = self.k[:b][order]
+            self._accumulate(0)
+        return self
+
+    def _reserve(self, size):
+        if size <= len(self.t): return
+        cap = max(size, 2 * len(self.t))
+        t = np.empty(cap); t[:self.m] = self.t[:self.m]; self.t = t
+        k = np.empty(cap, dtype=np.int16); k[:self.m] = self.k[:self.m]; self.k = k
+        p = np.zeros((cap + 1, len(KEYS)), dtype=np.int32); p[:self.m + 1] = self.prefix[:self.m + 1]; self.prefix = p
+
+    def _accumulate(self, a):
+        # prefix[a+1:] を記録 a 以降から作り直す（一時配列が大きくならないよう BLOCK 件ずつ）
+        for s in range(a, self.m, BLOCK):
+            e = min(s + BLOCK, self.m)
+            onehot = np.zeros((e - s, len(KEYS)), dtype=np.int32); onehot[np.arange(e - s), self.k[s:e]] = 1
+            self.prefix[s + 1:e + 1] = self.prefix[s] + np.cumsum(onehot, axis=0)
+
+    # --- 時間帯の件数 ---
+    def _index(self, ts):
+        return np.searchsorted(self.t[:self.m], ts, side="left")
+
+    def counts(self, t0=None, t1=None):
+        # [t0, t1) の KEYS ごとの件数（省略した端は試合の最初・最後）
+        i0 = 0 if t0 is None else int(self._index(t0)); i1 = self.m if t1 is None else int(self._index(t1))
+        return self.prefix[max(i1, i0)] - self.prefix[i0]
+
+    def counts_in(self, intervals):
+        # 区間の並び [(t0, t1), ...]（重なりなし）を合わせた件数
+        if not intervals: return np.zeros(len(KEYS), dtype=np.int64)
+        iv = np.asarray(intervals, dtype=float)
+        i0, i1 = self._index(iv[:, 0]), self._index(iv[:, 1])
+        return (self.prefix[i1].astype(np.int64) - self.prefix[i0]).sum(axis=0)
+
+    def _counters(self, vec, team):
+        off, dfn = Counter(), Counter()
+        for (t, c, r), v in zip(KEYS, vec.tolist()):
+            if v: (off if t == team else dfn)[(c, r)] += v
+        return off, dfn
+
+    def stats(self, team, t0=None, t1=None, intervals=None):
+        # STAT_ITEMS の値（StatsStore.stats と同じ式）を時間帯・区間で絞って返す
+        vec = self.counts_in(intervals) if intervals is not None else self.counts(t0, t1)
+        return _stats_from_counters(*self._counters(vec, team))
+
+    def goals(self, team, t0=None, t1=None, intervals=None):
+        vec = self.counts_in(intervals) if intervals is not None else self.counts(t0, t1)
+        ti = TEAMS.index(team); g = RESULTS.index("G")
+        return int(sum(vec[(ti * _N_CAT + c) * _N_RES + g] for c in range(_N_CAT)))
+
+    def scoring_runs(self):
+        # 得点の連続（同じチームが続けて決めた区間）を (チーム, 得点数, 最初の時間, 最後の時間) の並びで返す
+        g = RESULTS.index("G"); k = self.k[:self.m]
+        is_goal = (k % _N_RES) == g
+        teams = (k[is_goal] // (_N_CAT * _N_RES)).astype(np.int64); ts = self.t[:self.m][is_goal]
+        if not len(teams): return []
+        starts = np.flatnonzero(np.r_[True, teams[1:] != teams[:-1]]); ends = np.r_[starts[1:], len(teams)]
+        return [(TEAMS[teams[s]], int(e - s), float(ts[s]), float(ts[e - 1])) for s, e in zip(starts, ends)]
+
+
+# ================================
+# 退場の区間
+# ================================
+def merge_intervals(intervals):
+    out = []
+    for a, b in sorted(intervals):
+        if out and a <= out[-1][1]: out[-1][1] = max(out[-1][1], b)
+        else: out.append([a, b])
+    return [tuple(iv) for iv in out]
+
+
+def manpower_intervals(suspensions, team, duration=SUSPENSION_SEC):
+    # (数的不利の時間帯, 数的優位の時間帯)。各時刻の退場者数を両チームで差し引き、
+    # 相手より多く退場していれば不利、少なければ優位（2 人対 1 人は不利、1 人ずつなら同数でどちらでもない）
+    delta = Counter()
+    for s in suspensions:
+        if s["team"] not in TEAMS: continue
+        d = 1 if s["team"] == team else -1
+        delta[s["start_time"]] += d; delta[s["start_time"] + duration] -= d
+    short, pp, net, prev = [], [], 0, None
+    for t in sorted(delta):
+        if net: (short if net > 0 else pp).append((prev, t))
+        net += delta[t]; prev = t
+    return merge_intervals(short), merge_intervals(pp)
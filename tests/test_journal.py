@@ -0,0 +1,122 @@
+import os
+import pytest
+from handball.events import EventLog
+from handball.journal import Journal, has_events, is_journal_id, journal_path, list_journals, new_journal_id, prune_journals
+from handball.roster import Roster
+from handball.shared import SharedMatch
+from handball.synthetic import generate_logs
+
+# ================================
+# ジャーナルの再生（クラッシュ後の復元）
+# ================================
+# アプリが書くのと同じ値（名簿・退場・時計・試合情報）と記録を書き、開き直して同じものが組み上がるかを見る。
+def write_match(path, n=30):
+    j = Journal(path); recs = generate_logs(n, seed=3)
+    ally = Roster([{"No.": "7", "名前": "a", "Pos": "GK"}, {"No.": "9", "名前": "b", "Pos": "CB"}]); opp = Roster([{"No.": "1", "名前": "相手選手"}])
+    values = {
+        "ally_players": ally.records(), "opp_players": opp.records(),
+        "suspensions": [{"team": "味方", "no": "9", "start_time": 300}],
+        "suspension_log": [{"team": "相手", "no": "1", "start_time": 100}, {"team": "味方", "no": "9", "start_time": 300}],
+        "last_sent_idx": 12,
+        "clock": {"running": False, "start_time": 0, "stopped_time": 640.5, "half": "後半"},
+        "meta": {"match_title_in": "練習試合", "match_date_in": "2026-04-01", "ally_name_in": "味方チーム", "opp_name_in": "北高"},
+    }
+    for i, r in enumerate(recs):
+        j.event(r)
+        if i == 10: j.put("clock", {"running": True, "start_time": 1.0, "stopped_time": 0, "half": "前半"})  # 後の値で上書きされる
+    for k, v in values.items(): j.put(k, v)
+    j.close()
+    return recs, values
+
+
+@pytest.fixture
+def path(tmp_path):
+    return journal_path(tmp_path, new_journal_id())
+
+
+def test_replay_rebuilds_logs_and_values(path):
+    recs, values = write_match(path)
+    j = Journal(path)
+    try:
+        assert list(j.logs) == list(EventLog.from_records(recs))
+        assert j.values == values
+        assert Roster(j.values["ally_players"]).gk_numbers() == ["7"] and Roster(j.values["opp_players"]).numbers() == ["1"]
+        # 再生した値と同じ値は書き直さない
+        size = path.stat().st_size
+        assert not j.put("clock", values["clock"]) and path.stat().st_size == size
+    finally:
+        j.close()
+
+
+def test_shared_match_continues_ids_after_replay(path):
+    recs, values = write_match(path, n=5)
+    m = SharedMatch(Journal(path))
+    try:
+        assert m.append({"チーム": "味方", "結果": "G", "時間": "11:00"}) == max(r["id"] for r in recs) + 1
+        assert set(m.versions) == set(values) and m.changes({})["suspensions"][1] == values["suspensions"]
+    finally:
+        m.close()
+    assert len(Journal(path).logs) == 6
+
+
+def test_torn_last_line_is_truncated(path):
+    recs, values = write_match(path, n=8)
+    good = path.stat().st_size
+    with open(path, "ab") as fp: fp.write('1234abcd {"k":"event","v":{"id":99,"チ'.encode("utf-8")[:-1])  # 書きかけで落ちた行
+    j = Journal(path)
+    try:
+        assert list(j.logs) == list(EventLog.from_records(recs)) and j.values == values
+        assert path.stat().st_size == good
+        j.event(dict(recs[0], id=100))
+    finally:
+        j.close()
+    # 切り詰めた後の追記も読める
+    assert [r["id"] for r in Journal(path).logs][-2:] == [recs[-1]["id"], 100]
+
+
+def test_corrupted_crc_stops_replay(path):
+    recs, _ = write_match(path, n=8)
+    lines = path.read_bytes().splitlines(keepends=True)
+    lines[3] = lines[3].replace(b'"id":3', b'"id":7')  # CRC が合わなくなる
+    path.write_bytes(b"".join(lines))
+    j = Journal(path)
+    try:
+        assert [r["id"] for r in j.logs] == [r["id"] for r in recs[:3]]
+        assert j.values == {} and path.stat().st_size == sum(len(l) for l in lines[:3])
+    finally:
+        j.close()
+
+
+def test_missing_file_starts_empty(path):
+    j = Journal(path)
+    try:
+        assert len(j.logs) == 0 and j.values == {} and path.exists()
+    finally:
+        j.close()
+
+
+# ================================
+# ジャーナル ID とファイルの整理
+# ================================
+def test_journal_ids_are_validated(tmp_path):
+    assert is_journal_id(new_journal_id())
+    for bad in (None, "", "../x", "20260401_120000_abcdeg", "20260401_120000_abcdef/..", "20260401_120000_abcdef\n"):
+        assert not is_journal_id(bad)
+        with pytest.raises(ValueError): journal_path(tmp_path, bad)
+    (tmp_path / "notes.journal").write_text("x")
+    assert list_journals(tmp_path) == []
+
+
+def test_prune_keeps_journals_with_events(tmp_path):
+    ids = [f"20260401_1200{i:02d}_abcdef" for i in range(6)]
+    for i, jid in enumerate(ids):
+        j = Journal(journal_path(tmp_path, jid))
+        if i % 2: j.event({"id": 0, "チーム": "味方"})
+        else: j.put("clock", {"running": False})
+        j.close()
+        os.utime(j.path, (1_000 + i, 1_000 + i))
+    prune_journals(tmp_path, keep=1, protect={ids[0]})
+    # 新しい 1 個（ids[5]）・保護した ids[0]・記録のあるものが残る
+    left = {jid for jid, _, _ in list_journals(tmp_path)}
+    assert left == {ids[0], ids[1], ids[3], ids[5]}
+    assert all(has_events(journal_path(tmp_path, jid)) for jid in (ids[1], ids[3], ids[5]))
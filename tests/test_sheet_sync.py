@@ -0,0 +1,169 @@
+import time
+from collections import Counter
+import pytest
+from handball.events import EventLog
+from handball.outbox import Outbox, SheetUploader, spool_logs
+from handball.sheet_sync import SHEET_COLUMNS, SYNC_KEY, MemoryWorksheet, SheetSyncError, append_logs, ensure_header
+from handball.synthetic import generate_logs
+
+# ================================
+# スプレッドシートへの追記送信（MemoryWorksheet で確認）
+# ================================
+# 送信の途中で落ちる・書いた直後に落ちる（シートには載ったが応答が返らない）シートで、
+# 再送しても sync_key が重ならず、全行が一度ずつ載ることを見る。
+class FlakyWorksheet(MemoryWorksheet):
+    # plan の順に、記録行の append_rows を "before"（書く前に失敗）/ "after"（書いてから失敗）/ None（成功）にする
+    def __init__(self, plan=(), rows=None):
+        super().__init__(rows)
+        self.plan = list(plan)
+
+    def append_rows(self, values, value_input_option="RAW"):
+        if values == [list(SHEET_COLUMNS)]: return super().append_rows(values, value_input_option)
+        step = self.plan.pop(0) if self.plan else None
+        if step == "before": raise ConnectionError("送信前に切断")
+        super().append_rows(values, value_input_option)
+        if step == "after": raise TimeoutError("応答なし")
+
+
+def sheet_keys(ws):
+    if not ws.row_values(1): return []
+    return ws.col_values(ws.row_values(1).index(SYNC_KEY) + 1)[1:]
+
+
+def assert_once(ws, keys):
+    got = sheet_keys(ws)
+    assert not [k for k, c in Counter(got).items() if c > 1]
+    assert sorted(got) == sorted(keys)
+
+
+@pytest.fixture
+def log():
+    return EventLog.from_records(generate_logs(95, seed=1))
+
+
+def expected_keys(log, match_id="m1"):
+    return [f"{match_id}|{r['id']}" for r in log]
+
+
+def no_sleep(sec):
+    pass
+
+
+def test_append_all_rows(log):
+    ws = MemoryWorksheet()
+    assert append_logs(ws, log, 0, batch_rows=20, match_id="m1", sleep=no_sleep) == len(log)
+    assert ws.row_values(1) == list(SHEET_COLUMNS)
+    assert_once(ws, expected_keys(log))
+    # 送信済みの位置からは何も送らない
+    assert append_logs(ws, log, len(log), match_id="m1", sleep=no_sleep) == len(log) and len(ws.rows) == len(log) + 1
+
+
+def test_failure_after_write_is_not_duplicated(log):
+    ws = FlakyWorksheet(["after", None, "after", "after", None])
+    assert append_logs(ws, log, 0, batch_rows=20, retries=2, match_id="m1", sleep=no_sleep) == len(log)
+    assert_once(ws, expected_keys(log))
+
+
+def test_failure_before_write_is_retried(log):
+    ws = FlakyWorksheet(["before", "before", None, "before"])
+    assert append_logs(ws, log, 0, batch_rows=50, retries=2, match_id="m1", sleep=no_sleep) == len(log)
+    assert_once(ws, expected_keys(log))
+
+
+def test_give_up_then_resume_with_verify(log):
+    # 2 つ目のバッチで再送も尽きる（最後は書いてから失敗）：送信済みの位置を返し、次回は verify して続きから送る
+    ws = FlakyWorksheet([None, "before", "before", "after"]); waits = []
+    with pytest.raises(SheetSyncError) as e:
+        append_logs(ws, log, 0, batch_rows=30, retries=2, backoff=1.0, match_id="m1", sleep=waits.append)
+    assert e.value.sent_idx == 30 and waits == [1.0, 2.0]
+    assert append_logs(ws, log, e.value.sent_idx, verify=True, batch_rows=30, match_id="m1", sleep=no_sleep) == len(log)
+    assert_once(ws, expected_keys(log))
+
+
+def test_sync_keys_separate_matches():
+    # 日付・試合名が同じで id も 0 から振り直した別の試合（リセット後）でも、試合 ID があれば重ならない
+    recs = generate_logs(10, seed=2); a, b = EventLog.from_records(recs), EventLog.from_records(recs)
+    ws = MemoryWorksheet()
+    append_logs(ws, a, 0, match_id="20260401_120000_aaaaaa"); append_logs(ws, b, 0, match_id="20260401_130000_bbbbbb")
+    assert len(set(sheet_keys(ws))) == 20
+    # 試合 ID がなければ「日付|試合名|id」
+    ws = MemoryWorksheet(); append_logs(ws, a, 0)
+    assert sheet_keys(ws) == [f"{r['日付']}|{r['試合名']}|{r['id']}" for r in recs]
+
+
+def test_header_gains_missing_columns():
+    ws = MemoryWorksheet([["試合名", "日付"], ["古い試合", "2026-01-01"]])
+    header = ensure_header(ws)
+    assert header[:2] == ["試合名", "日付"] and set(SHEET_COLUMNS) <= set(header) and ws.row_values(1) == header
+    assert ensure_header(ws) == header
+
+
+# ================================
+# outbox とバックグラウンド送信
+# ================================
+def wait_until(cond, timeout=10.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end: raise AssertionError("timeout")
+        time.sleep(0.01)
+
+
+def start_uploader(outbox, factory):
+    up = SheetUploader(outbox, factory, batch_rows=25, poll_sec=0.01, max_backoff=0.01); up.start()
+    return up
+
+
+def test_spool_does_not_queue_twice(tmp_path, log):
+    box = Outbox(tmp_path / "outbox.db")
+    assert spool_logs(box, log, 0, "m1") == len(log) and len(box) == len(log)
+    spool_logs(box, log, 40, "m1")
+    assert len(box) == len(log)
+    assert [r[SYNC_KEY] for _, r in box.peek(3)] == expected_keys(log)[:3]
+
+
+def test_uploader_retries_without_duplicates(tmp_path, log):
+    box = Outbox(tmp_path / "outbox.db"); spool_logs(box, log, 0, "m1")
+    ws = FlakyWorksheet(["after", None, "before", "after", "after", None])
+    calls = Counter()
+    def factory():
+        calls["open"] += 1
+        if calls["open"] == 2: raise ConnectionError("再接続に失敗")
+        return ws
+    up = start_uploader(box, factory)
+    try:
+        wait_until(lambda: len(box) == 0)
+        wait_until(lambda: up.status()["failures"] == 0)
+    finally:
+        up.stop(); up.join(5)
+    assert_once(ws, expected_keys(log))
+    assert up.status()["last_error"] is None and up.last_flush_at is not None and calls["open"] >= 3
+
+
+def test_uploader_skips_rows_already_on_sheet(tmp_path, log):
+    # 前回のプロセスが先頭のバッチをシートに書いた直後（outbox から消す前）に落ちた：起動直後の確認で送り直さない
+    box = Outbox(tmp_path / "outbox.db"); spool_logs(box, log, 0, "m1")
+    ws = MemoryWorksheet()
+    for _, r in box.peek(25):
+        header = ensure_header(ws); ws.append_rows([[r.get(c, "") for c in header]])
+    up = start_uploader(box, lambda: ws)
+    try:
+        wait_until(lambda: len(box) == 0)
+    finally:
+        up.stop(); up.join(5)
+    assert_once(ws, expected_keys(log))
+
+
+def test_uploader_picks_up_new_rows(tmp_path, log):
+    # 記録が増えるたびに末尾だけ積む
+    box = Outbox(tmp_path / "outbox.db"); ws = MemoryWorksheet(); live = EventLog(); recs = list(log)
+    up = start_uploader(box, lambda: ws)
+    try:
+        for r in recs[:40]: live.append(r)
+        sent = spool_logs(box, live, 0, "m1"); up.notify()
+        wait_until(lambda: len(sheet_keys(ws)) == 40)
+        for r in recs[40:]: live.append(r)
+        spool_logs(box, live, sent, "m1"); up.notify()
+        wait_until(lambda: len(box) == 0 and len(sheet_keys(ws)) == len(log))
+    finally:
+        up.stop(); up.join(5)
+    assert_once(ws, expected_keys(log))
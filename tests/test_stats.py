@@ -0,0 +1,82 @@
+import random
+import pytest
+from handball.stats import STAT_ITEMS, StatsStore, get_stats_logic
+
+# ================================
+# StatsStore / get_stats_logic と従来の get_stats_logic の一致確認
+# ================================
+# 従来の関数（ログ全体を毎回走査する版）をそのまま残し、乱数で作ったログで全項目を比べる。
+TRIALS = 300
+
+
+def legacy_get_stats_logic(logs_to_calc, team_name, all_logs, target_no=None, is_gk_target=False):
+    l_off = [l for l in logs_to_calc if l["チーム"] == team_name]
+    if target_no and not is_gk_target: l_off = [l for l in l_off if l["No."] == target_no]
+    l_field = [l for l in l_off if l["位置"] != "9" and l["状況"] != "7m"]; l_7m = [l for l in l_off if (l["位置"] == "9" or l["状況"] == "7m")]
+    def calc_rate_val(num, den): return round((num/den)*100, 1) if den > 0 else 0.0
+
+    shots = [l for l in l_field if l["結果"] in ["G", "O", "Save"]]; goals = [l for l in shots if l["結果"] == "G"]
+    fb_all = [l for l in l_field if l["状況"] == "FB"]; fb_shots = [l for l in fb_all if l["結果"] in ["G", "O", "Save"]]; fb_goals = [l for l in fb_shots if l["結果"] == "G"]
+    tf_cnt = sum(1 for l in l_off if l["結果"] == "TF"); rtf_cnt = sum(1 for l in l_off if l["結果"] == "RTF")
+
+    l_opp_all = [l for l in all_logs if l["チーム"] != team_name]
+    if is_gk_target:
+        my_def = [l for l in l_opp_all if l.get("vs_gk") == target_no]
+        l_def_f = [l for l in my_def if l["位置"] != "9" and l["状況"] != "7m"]; l_def_7 = [l for l in my_def if (l["位置"] == "9" or l["状況"] == "7m")]
+        def gk_rate(lst):
+            sh = [l for l in lst if l["結果"] in ["G", "O", "Save"]]; sv = [l for l in sh if l["結果"] == "Save"]
+            return round((len(sv)/len(sh))*100, 1) if len(sh) > 0 else 0.0
+        sht_sav, fb_sav, m7_sav = gk_rate(l_def_f), gk_rate([l for l in l_def_f if l["状況"]=="FB"]), gk_rate(l_def_7)
+    else:
+        l_opp_f = [l for l in l_opp_all if l["位置"] != "9" and l["状況"] != "7m"]; l_opp_7 = [l for l in l_opp_all if (l["位置"] == "9" or l["状況"] == "7m")]
+        def tm_rate(lst):
+            sh = [l for l in lst if l["結果"] in ["G", "O", "Save"]]; sv = [l for l in sh if l["結果"] == "Save"]
+            return round((len(sv)/len(sh))*100, 1) if len(sh) > 0 else 0.0
+        sht_sav, fb_sav, m7_sav = tm_rate(l_opp_f), tm_rate([l for l in l_opp_f if l["状況"]=="FB"]), tm_rate(l_opp_7)
+    return {"atk_suc": calc_rate_val(len(shots), len(l_field)), "sht_suc": calc_rate_val(len(goals), len(shots)), "fb_suc": calc_rate_val(len(fb_shots), len(fb_all)), "fb_sht_suc": calc_rate_val(len(fb_goals), len(fb_shots)), "m7_cnt": float(len(l_7m)), "m7_sht_suc": calc_rate_val(sum(1 for l in l_7m if l["結果"]=="G"), len([l for l in l_7m if l["結果"] in ["G", "O", "Save"]])), "tf": float(tf_cnt), "rtf": float(rtf_cnt), "sht_sav": sht_sav, "fb_sav": fb_sav, "m7_sav": m7_sav}
+
+
+def random_logs(rng, n):
+    # アプリでは起きない組み合わせ（位置 9 で Set、vs_gk なし など）も混ぜる
+    nos = ["1", "7", "12", "未登録"]
+    out = []
+    for i in range(n):
+        r = {"id": i, "チーム": rng.choice(("味方", "相手")), "No.": rng.choice(nos), "位置": rng.choice([str(z) for z in range(1, 10)]),
+             "結果": rng.choice(("G", "O", "Save", "TF", "RTF")), "状況": rng.choice(("Set", "FB", "7m")), "ピリオド": rng.choice(("前半", "後半"))}
+        if rng.random() < 0.9: r["vs_gk"] = rng.choice(nos)
+        out.append(r)
+    return out
+
+
+def targets(logs):
+    nos = sorted({l["No."] for l in logs} | {l.get("vs_gk") for l in logs if l.get("vs_gk")}) + ["99"]
+    yield None, False
+    for no in nos: yield no, False; yield no, True
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_matches_legacy(seed):
+    rng = random.Random(seed)
+    logs = random_logs(rng, rng.randrange(0, 80)); store = StatsStore(logs)
+    for team in ("味方", "相手"):
+        for no, is_gk in targets(logs):
+            want = legacy_get_stats_logic(logs, team, logs, no, is_gk)
+            assert get_stats_logic(logs, team, logs, no, is_gk) == want
+            assert store.stats(team, target_no=no, is_gk_target=is_gk) == want
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_legacy_with_separate_logs(seed):
+    # 攻撃側だけを絞ったログ（従来の呼び出し方の一つ）
+    rng = random.Random(seed); logs = random_logs(rng, 60); half = [l for l in logs if l["ピリオド"] == "前半"]
+    for team in ("味方", "相手"):
+        for no, is_gk in targets(logs):
+            assert get_stats_logic(half, team, logs, no, is_gk) == legacy_get_stats_logic(half, team, logs, no, is_gk)
+
+
+def test_incremental_sync_matches_rebuild():
+    rng = random.Random(0); logs = random_logs(rng, 200); store = StatsStore()
+    for k in range(0, len(logs) + 1, 17):
+        store.sync(logs[:k])
+        assert store.stats("味方") == legacy_get_stats_logic(logs[:k], "味方", logs[:k])
+    assert set(store.stats("相手")) == {key for _, key in STAT_ITEMS}
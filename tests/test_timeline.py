@@ -0,0 +1,142 @@
+import random
+import pytest
+import numpy as np
+from handball.events import EventLog
+from handball.schema import parse_clock
+from handball.stats import StatsStore
+from handball.timeline import KEYS, Timeline, manpower_intervals, _key_codes
+
+# ================================
+# Timeline（時間帯の集計）と StatsStore の一致確認
+# ================================
+# 乱数で作ったログを少しずつ取り込み、時間帯ごとの集計を「その時間帯の行だけで作った StatsStore」と比べる。
+TRIALS = 60
+MATCH_SEC = 3600
+
+
+def random_logs(rng, n, in_order):
+    # 時間の読めない行（空・書式違い）も混ぜる。in_order=False なら時間が前後する
+    secs = sorted(rng.randrange(MATCH_SEC) for _ in range(n))
+    if not in_order: rng.shuffle(secs)
+    out = []
+    for i, t in enumerate(secs):
+        clock = rng.choice((None, "??")) if rng.random() < 0.05 else f"{t // 60:02d}:{t % 60:02d}"
+        out.append({"id": i, "時間": clock, "チーム": rng.choice(("味方", "相手")), "No.": rng.choice(("1", "7", "12")),
+                    "位置": rng.choice([str(z) for z in range(1, 10)]), "結果": rng.choice(("G", "O", "Save", "TF", "RTF")),
+                    "状況": rng.choice(("Set", "FB", "7m")), "ピリオド": "前半" if t < MATCH_SEC // 2 else "後半", "vs_gk": "1"})
+    return out
+
+
+def synced(rng, logs):
+    # ばらばらの大きさで末尾から取り込む
+    log, tl, k = EventLog(), Timeline(capacity=4), 0
+    while k < len(logs):
+        step = rng.randrange(1, 40)
+        for r in logs[k:k + step]: log.append(r)
+        tl.sync(log); k += step
+    return log, tl
+
+
+def in_window(logs, t0, t1):
+    return [l for l in logs if parse_clock(l["時間"]) is not None and t0 <= parse_clock(l["時間"]) < t1]
+
+
+def windows(rng, k=15):
+    yield 0, MATCH_SEC; yield 0, 0; yield MATCH_SEC, MATCH_SEC + 60
+    for _ in range(k):
+        a, b = sorted(rng.randrange(-60, MATCH_SEC + 60) for _ in range(2))
+        yield a, b
+
+
+@pytest.mark.parametrize("in_order", (True, False))
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_window_stats_match_stats_store(seed, in_order):
+    rng = random.Random(seed)
+    logs = random_logs(rng, rng.randrange(0, 300), in_order); _, tl = synced(rng, logs)
+    assert tl.m == sum(1 for l in logs if parse_clock(l["時間"]) is not None)
+    for t0, t1 in windows(rng):
+        store = StatsStore(in_window(logs, t0, t1))
+        for team in ("味方", "相手"):
+            assert tl.stats(team, t0, t1) == store.stats(team)
+            assert tl.goals(team, t0, t1) == store.goals(team)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_counts_in_is_sum_of_windows(seed):
+    rng = random.Random(seed)
+    logs = random_logs(rng, 200, in_order=seed % 2 == 0); _, tl = synced(rng, logs)
+    cuts = sorted(rng.sample(range(MATCH_SEC), 8)); intervals = list(zip(cuts[::2], cuts[1::2]))
+    want = sum((tl.counts(a, b).astype(np.int64) for a, b in intervals), np.zeros(len(KEYS), dtype=np.int64))
+    assert (tl.counts_in(intervals) == want).all()
+    rows = [l for a, b in intervals for l in in_window(logs, a, b)]
+    assert tl.stats("味方", intervals=intervals) == StatsStore(rows).stats("味方")
+    assert (tl.counts_in([]) == 0).all()
+
+
+def test_counts_covers_every_key():
+    logs = random_logs(random.Random(1), 500, in_order=False); log, tl = synced(random.Random(2), logs)
+    keys = _key_codes(log, 0, len(log))[~np.isnan(log.seconds())]
+    assert (tl.counts() == np.bincount(keys, minlength=len(KEYS))).all()
+
+
+def legacy_scoring_runs(logs):
+    # 時間順（同じ時間は記録順）に並べた得点を、チームが変わるところで区切る
+    goals = sorted((l for l in logs if l["結果"] == "G" and parse_clock(l["時間"]) is not None), key=lambda l: parse_clock(l["時間"]))
+    runs = []
+    for l in goals:
+        t = float(parse_clock(l["時間"]))
+        if runs and runs[-1][0] == l["チーム"]: runs[-1] = (l["チーム"], runs[-1][1] + 1, runs[-1][2], t)
+        else: runs.append((l["チーム"], 1, t, t))
+    return runs
+
+
+@pytest.mark.parametrize("in_order", (True, False))
+@pytest.mark.parametrize("seed", range(20))
+def test_scoring_runs(seed, in_order):
+    rng = random.Random(seed)
+    logs = random_logs(rng, rng.randrange(0, 150), in_order); _, tl = synced(rng, logs)
+    assert tl.scoring_runs() == legacy_scoring_runs(logs)
+
+
+def test_sync_rebuilds_for_another_log():
+    rng = random.Random(0)
+    _, tl = synced(rng, random_logs(rng, 50, in_order=True))
+    b = EventLog.from_records(random_logs(rng, 30, in_order=False)[:10])
+    tl.sync(b)
+    assert tl.n == 10 and int(tl.counts().sum()) == tl.m
+
+
+# ================================
+# 退場による数的不利・優位の時間帯
+# ================================
+def manpower_at(suspensions, team, t, duration=120):
+    own = sum(1 for s in suspensions if s["team"] == team and s["start_time"] <= t < s["start_time"] + duration)
+    other = sum(1 for s in suspensions if s["team"] != team and s["start_time"] <= t < s["start_time"] + duration)
+    return own - other
+
+
+def covers(intervals, t):
+    return any(a <= t < b for a, b in intervals)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_manpower_intervals_match_net_count(seed):
+    rng = random.Random(seed)
+    susp = [{"team": rng.choice(("味方", "相手")), "no": "7", "start_time": rng.randrange(0, 600, 10)} for _ in range(rng.randrange(0, 8))]
+    for team in ("味方", "相手"):
+        short, pp = manpower_intervals(susp, team)
+        for iv in (short, pp):
+            assert all(a < b for a, b in iv) and all(b < c for (_, b), (c, _) in zip(iv, iv[1:]))  # 昇順・重なりなし・隣とはまとめ済み
+        for t in range(-5, 800, 5):
+            net = manpower_at(susp, team, t)
+            assert covers(short, t) == (net > 0) and covers(pp, t) == (net < 0)
+
+
+def test_manpower_intervals_offset_each_other():
+    s = lambda team, t: {"team": team, "no": "7", "start_time": t}
+    # 同時に 1 人ずつ退場している間は同数（どちらにも入らない）
+    assert manpower_intervals([s("味方", 0), s("相手", 60)], "味方") == ([(0, 60)], [(120, 180)])
+    assert manpower_intervals([s("味方", 0), s("相手", 60)], "相手") == ([(120, 180)], [(0, 60)])
+    # 2 人対 1 人は不利のまま
+    assert manpower_intervals([s("味方", 0), s("味方", 30), s("相手", 60)], "味方") == ([(0, 120)], [(150, 180)])
+    assert manpower_intervals([], "味方") == ([], [])